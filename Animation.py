@@ -0,0 +1,459 @@
+import numpy as np
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageDraw
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.patches as pch
+
+#Shortest per-frame delay most GIF viewers honour; anything below this gets
+#clamped (often to 100 ms), which is why very high fps settings used to play
+#back slower than asked for
+MIN_FRAME_MS = 20
+DEFAULT_FRAME_MS = 20
+#Colours in the palette shared by every frame of an animation
+PALETTE_COLORS = 64
+#Pillow format names for the animation file types we can write
+ANIMATION_FORMATS = {
+    ".gif":"GIF",
+    ".png":"PNG",
+    ".apng":"PNG",
+    ".webp":"WEBP"
+}
+#Frame ranges handed out per worker process when rendering in parallel
+CHUNKS_PER_WORKER = 4
+
+
+'''
+Decides which trajectory points each animation frame ends at, so that every
+frame emitted is distinct
+################################################################################
+nPoints -> Number of points in the trajectory
+frameCount -> Number of frames wanted; takes priority over frameSlice
+frameSlice -> Legacy spacing of one frame per frameSlice points
+################################################################################
+Return ends -> Increasing array of exclusive end indices, one per frame; the
+    last frame always shows the whole trajectory
+'''
+def planFrames(nPoints, frameCount=None, frameSlice=10):
+    if frameCount is None:
+        frameCount = int(np.ceil(nPoints/max(int(frameSlice), 1)))
+    frameCount = int(min(max(frameCount, 1), max(nPoints - 1, 1)))
+    #Every frame needs at least two points to draw a segment
+    ends = np.linspace(2, nPoints, frameCount).round().astype(int)
+    return np.unique(np.clip(ends, min(2, nPoints), nPoints))
+
+
+'''
+Works out how long each frame is shown for
+################################################################################
+frameCount -> Number of frames in the animation
+duration -> Target length of the whole animation in seconds (optional)
+fps -> Target frame rate, used when no duration is given (optional)
+################################################################################
+Return frameMs -> Per-frame delay in milliseconds, rounded to the 10 ms
+    resolution GIFs store and no shorter than MIN_FRAME_MS
+'''
+def frameDelay(frameCount, duration=None, fps=None):
+    if duration is not None:
+        frameMs = 1000*duration/max(frameCount, 1)
+    elif fps is not None:
+        frameMs = 1000/fps
+    else:
+        frameMs = DEFAULT_FRAME_MS
+    return int(max(MIN_FRAME_MS, 10*round(frameMs/10)))
+
+
+'''
+Works out the plot limits the animation is framed with
+################################################################################
+x, y -> Converted trajectory coordinates
+boundScale -> Factor the extremes of the trajectory are scaled by
+################################################################################
+Return [xMin, xMax, yMin, yMax]
+'''
+def animationBounds(x, y, boundScale):
+    return [boundScale * np.amin(x), boundScale * np.amax(x),
+        boundScale * np.amin(y), boundScale * np.amax(y)]
+
+
+class MatplotlibRenderer():
+
+    '''
+    Draws trajectory animations with matplotlib, one new segment per frame, onto
+    a persistent Agg canvas; the static parts (axes, labels, horizon) are drawn
+    exactly once
+    ################################################################################
+    x, y -> Converted trajectory coordinates
+    paramUnits -> Units for the x and y axis labels
+    boundScale -> See animationBounds()
+    figsize -> Figure size in inches
+    dpi -> Figure resolution
+    ################################################################################
+    '''
+    def __init__(self, x, y, paramUnits=["meters", "meters"], boundScale=1.3,
+        figsize=(5, 5), dpi=100):
+        self.x = x
+        self.y = y
+
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_aspect(1)
+
+        self.ax.set_xlabel("x" + "(" + paramUnits[0]  + ")")
+        self.ax.set_ylabel("y" + "(" + paramUnits[1] +  ")")
+
+        xMin, xMax, yMin, yMax = animationBounds(x, y, boundScale)
+        self.ax.set(xlim=(xMin, xMax), ylim=(yMin, yMax))
+
+        circle = pch.Circle((0,0),radius=2,color='black')
+        self.ax.add_patch(circle)
+
+        #The segment line is animated so the static draw leaves it out; it is
+        #only ever drawn on top of what is already on the canvas
+        self.line = self.ax.plot(x[:1], y[:1], color='b', lw=2,
+            solid_capstyle='round', animated=True)[0]
+
+    '''
+    Draws the static background, then each frame's new segment on top of the
+    previous frame
+    ################################################################################
+    ends -> Frame end indices from planFrames()
+    start -> Index of the first frame to produce; the part of the trajectory
+        before it is drawn in one go first
+    stop -> Index one past the last frame to produce (defaults to all)
+    ################################################################################
+    Yields frame -> (H, W, 3) uint8 RGB array for each frame
+    '''
+    def iterFrames(self, ends, start=0, stop=None):
+        stop = len(ends) if stop is None else stop
+        self.canvas.draw()
+        drawnTo = 1
+        if start > 0:
+            drawnTo = self.drawSegment(0, ends[start - 1])
+        for frame in range(start, stop):
+            drawnTo = self.drawSegment(drawnTo - 1, ends[frame])
+            yield np.asarray(self.canvas.buffer_rgba())[:, :, :3].copy()
+
+    '''
+    Draws the trajectory between two indices onto the canvas
+    ################################################################################
+    begin, end -> Index range to draw; begin overlaps the previous segment by a
+        point so consecutive segments join up
+    ################################################################################
+    Return end -> Index drawn up to
+    '''
+    def drawSegment(self, begin, end):
+        self.line.set_data(self.x[begin:end], self.y[begin:end])
+        self.ax.draw_artist(self.line)
+        return end
+
+    '''
+    Builds the palette every frame is quantized to, from the final frame (which
+    contains every colour any earlier frame can)
+    ################################################################################
+    colors -> Number of palette entries
+    ################################################################################
+    Return palette -> "P" mode image carrying the palette
+    '''
+    def makePalette(self, colors=PALETTE_COLORS):
+        finalFrame = next(self.iterFrames([len(self.x)]))
+        return paletteFromFrame(finalFrame, colors)
+
+    '''
+    Same as iterFrames(), with each frame mapped onto a shared palette
+    ################################################################################
+    ends, start, stop -> As for iterFrames()
+    palette -> Palette image from makePalette()
+    ################################################################################
+    Yields image -> "P" mode image for each frame
+    '''
+    def iterImages(self, ends, palette, start=0, stop=None):
+        for frame in self.iterFrames(ends, start, stop):
+            yield quantizeFrame(frame, palette)
+
+
+class PillowRenderer():
+
+    '''
+    Lightweight alternative to MatplotlibRenderer that skips matplotlib after
+    setup. matplotlib lays out and draws the static background (axes, labels,
+    horizon) once, with exactly the same framing; the trajectory is then mapped
+    to pixel coordinates once, and each frame draws only its new segment onto a
+    persistent palette image with Pillow
+    ################################################################################
+    x, y, paramUnits, boundScale, figsize, dpi -> As for MatplotlibRenderer()
+    lineColor -> RGB colour of the trajectory
+    ################################################################################
+    '''
+    def __init__(self, x, y, paramUnits=["meters", "meters"], boundScale=1.3,
+        figsize=(5, 5), dpi=100, lineColor=(0, 0, 255)):
+        layout = MatplotlibRenderer(x, y, paramUnits=paramUnits,
+            boundScale=boundScale, figsize=figsize, dpi=dpi)
+        layout.canvas.draw()
+        self.background = np.asarray(layout.canvas.buffer_rgba())[:, :, :3].copy()
+        height = self.background.shape[0]
+
+        #Matplotlib's display coordinates start at the bottom left, Pillow's at
+        #the top left; points are kept relative to the axes box so drawing is
+        #clipped to it the same way matplotlib clips the line
+        extent = layout.ax.get_window_extent()
+        self.axesBox = (int(np.floor(extent.x0)), int(np.floor(height - extent.y1)),
+            int(np.ceil(extent.x1)), int(np.ceil(height - extent.y0)))
+        pixels = layout.ax.transData.transform(np.column_stack((x, y)))
+        self.points = np.empty_like(pixels)
+        self.points[:, 0] = pixels[:, 0] - self.axesBox[0]
+        self.points[:, 1] = height - pixels[:, 1] - self.axesBox[1]
+
+        self.lineColor = tuple(lineColor)
+        #Matches matplotlib's lw=2 (points) at this resolution
+        self.lineWidth = max(1, int(round(2*dpi/72)))
+        self.nPoints = len(x)
+
+    '''
+    Builds the fixed palette: the background's colours plus the line colour
+    ################################################################################
+    colors -> Number of palette entries
+    ################################################################################
+    Return palette -> "P" mode image carrying the palette
+    '''
+    def makePalette(self, colors=PALETTE_COLORS):
+        background = paletteFromFrame(self.background, colors - 1)
+        palette = Image.new("P", (1, 1))
+        palette.putpalette(background.getpalette() + list(self.lineColor))
+        return palette
+
+    '''
+    Draws each frame's new segment onto a persistent image
+    ################################################################################
+    ends, start, stop -> As for MatplotlibRenderer.iterFrames()
+    palette -> Palette image from makePalette()
+    ################################################################################
+    Yields image -> "P" mode image for each frame
+    '''
+    def iterImages(self, ends, palette, start=0, stop=None):
+        stop = len(ends) if stop is None else stop
+        background = quantizeFrame(self.background, palette)
+        lineIndex = len(palette.getpalette())//3 - 1
+        plotArea = background.crop(self.axesBox)
+        draw = ImageDraw.Draw(plotArea)
+
+        def drawSegment(begin, end):
+            draw.line(self.points[begin:end].ravel().tolist(), fill=lineIndex,
+                width=self.lineWidth, joint="curve")
+            return end
+
+        drawnTo = 1
+        if start > 0:
+            drawnTo = drawSegment(0, ends[start - 1])
+        for frame in range(start, stop):
+            drawnTo = drawSegment(drawnTo - 1, ends[frame])
+            image = background.copy()
+            image.paste(plotArea, self.axesBox[:2])
+            yield image
+
+
+#Renderers selectable through the backend argument of makeAnimation()
+RENDERERS = {
+    "matplotlib":MatplotlibRenderer,
+    "pillow":PillowRenderer
+}
+
+
+'''
+Builds a palette from the most common colours of a frame, so that the large
+flat areas (background, axes, horizon, line) are reproduced exactly and only
+anti-aliased edge pixels get approximated
+################################################################################
+frame -> (H, W, 3) uint8 array
+colors -> Maximum number of palette entries
+################################################################################
+Return palette -> "P" mode image carrying the palette
+'''
+def paletteFromFrame(frame, colors):
+    image = Image.fromarray(frame)
+    counts = image.getcolors(image.width*image.height)
+    counts.sort(key=lambda count: count[0], reverse=True)
+    entries = []
+    for count, color in counts[:colors]:
+        entries.extend(color)
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(entries)
+    return palette
+
+
+'''
+Maps an RGB frame onto the shared palette
+################################################################################
+frame -> (H, W, 3) uint8 array
+palette -> Palette image from a renderer's makePalette()
+################################################################################
+Return image -> "P" mode image
+'''
+def quantizeFrame(frame, palette):
+    return Image.fromarray(frame).quantize(palette=palette, dither=Image.Dither.NONE)
+
+
+'''
+Renders a contiguous range of frames; the unit of work handed to each worker
+process by renderFramesParallel() (module level so it can be pickled)
+################################################################################
+args -> (x, y, ends, start, stop, backend, rendererOptions, paletteBytes)
+################################################################################
+Return [size, frames] -> Frame size and a list of the raw "P" mode bytes of
+    frames start to stop - 1
+'''
+def renderFrameRange(args):
+    x, y, ends, start, stop, backend, rendererOptions, paletteBytes = args
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(paletteBytes)
+    renderer = RENDERERS[backend](x, y, **rendererOptions)
+    frames = list(renderer.iterImages(ends, palette, start, stop))
+    return [frames[0].size, [frame.tobytes() for frame in frames]]
+
+
+'''
+Renders every frame in this process
+################################################################################
+renderer -> MatplotlibRenderer or PillowRenderer to draw with
+ends -> Frame end indices from planFrames()
+palette -> Palette image from the renderer's makePalette()
+################################################################################
+Yields image -> "P" mode image for each frame, in order
+'''
+def renderFrames(renderer, ends, palette):
+    return renderer.iterImages(ends, palette)
+
+
+'''
+Renders frames across a pool of worker processes, each with its own headless
+renderer, and hands them back in order. Only a few ranges are in flight at once,
+so rendering holds at most 2*workers ranges of frames however long the
+animation is (what the file writer keeps is another matter, see saveFrames())
+################################################################################
+x, y -> Converted trajectory coordinates
+ends -> Frame end indices from planFrames()
+backend -> Key into RENDERERS
+rendererOptions -> Keyword arguments for the renderer
+palette -> Palette image from the renderer's makePalette()
+workers -> Number of worker processes
+################################################################################
+Yields image -> "P" mode image for each frame, in order
+'''
+def renderFramesParallel(x, y, ends, backend, rendererOptions, palette, workers):
+    paletteBytes = palette.getpalette()
+    chunkCount = max(1, min(len(ends), workers*CHUNKS_PER_WORKER))
+    bounds = np.linspace(0, len(ends), chunkCount + 1).round().astype(int)
+    tasks = [
+        (x, y, ends, bounds[index], bounds[index + 1], backend, rendererOptions,
+            paletteBytes)
+        for index in range(chunkCount) if bounds[index + 1] > bounds[index]
+        ]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        nextTask = 0
+        while nextTask < len(tasks) or pending:
+            while nextTask < len(tasks) and len(pending) < 2*workers:
+                pending.append(pool.submit(renderFrameRange, tasks[nextTask]))
+                nextTask += 1
+            size, frames = pending.popleft().result()
+            for data in frames:
+                image = Image.frombytes("P", size, data)
+                image.putpalette(paletteBytes)
+                yield image
+
+
+'''
+Passes frames through unchanged, reporting how many have gone by
+################################################################################
+frames -> Iterable of frames
+total -> Number of frames expected
+progress -> Callback taking the fraction of frames passed so far (0 to 1)
+################################################################################
+Yields each frame of frames
+'''
+def countFrames(frames, total, progress):
+    for count, frame in enumerate(frames, 1):
+        yield frame
+        progress(count/max(total, 1))
+
+
+'''
+Passes frames through unchanged, adding up how long each took to produce
+################################################################################
+frames -> Iterable of frames, e.g. from renderFrames()
+totals -> [wall seconds, CPU seconds, frames] to add to, updated as frames
+    go by
+################################################################################
+Yields each frame of frames
+'''
+def timeFrames(frames, totals):
+    frames = iter(frames)
+    while True:
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        frame = next(frames, None)
+        totals[0] += time.perf_counter() - wall
+        totals[1] += time.thread_time() - cpu
+        if frame is None:
+            return
+        totals[2] += 1
+        yield frame
+
+
+'''
+Writes a sequence of frames out as an animation, in the format given by the
+file extension (see ANIMATION_FORMATS). The trajectory only ever grows, so
+every writer is set up to keep each frame on screen and store just the region
+that changed since the previous one; GIF and APNG get that from comparing
+consecutive shared-palette frames, WebP from its own inter-frame encoder.
+Memory grows with the number of frames: frames are rendered as the writer asks
+for them, but Pillow's writers all keep every one of them until the whole file
+is written. Frames stay paletted until then (one byte per pixel, e.g. 250 kB at
+500x500, so about 750 MB for 3000 frames); WebP converts each to RGB only as it
+encodes it, and its encoder needs some more on top
+################################################################################
+filename -> File to write to
+frames -> Iterable of "P" mode images sharing one palette
+frameMs -> Per-frame delay in milliseconds
+################################################################################
+Return count -> Number of frames written
+'''
+def saveFrames(filename, frames, frameMs):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in ANIMATION_FORMATS:
+        raise ValueError("Can't write animations of type " + extension)
+    fileFormat = ANIMATION_FORMATS[extension]
+    written = [0]
+
+    def images():
+        for frame in frames:
+            written[0] += 1
+            yield frame
+
+    if fileFormat == "GIF":
+        #Don't dispose of frames, so each one only has to hold its changed
+        #bounding box; the frames already share a palette, so skip Pillow's
+        #per-frame palette optimization too
+        options = {"disposal":1, "optimize":False}
+    elif fileFormat == "PNG":
+        #Same for APNG: keep the previous frame and overwrite the changed box
+        options = {"disposal":0, "blend":0, "default_image":False}
+    else:
+        #Lossless, and every frame after the first coded against the one
+        #before it (no periodic key frames)
+        options = {"lossless":True, "kmin":0, "kmax":0}
+
+    sequence = images()
+    firstImage = next(sequence)
+    if fileFormat == "PNG":
+        #Pillow's APNG writer walks the frames twice (and keeps them all
+        #anyway), so it can't be handed a generator
+        sequence = list(sequence)
+    firstImage.save(filename, format=fileFormat, save_all=True,
+        append_images=sequence, duration=frameMs, loop=0, **options)
+    return written[0]
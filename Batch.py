@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Metrics import writeRecord
+from Runner import SPAWN_CONTEXT, executeRun, runStopConditions
+
+################################################################################
+# Headless batch runner: runs the same stages as the GUI (data file, component
+# plot, parametric plot, animation) for every job in one or more job files,
+# on the Agg backend and without ever creating a Tk window, spreading the jobs
+# over a process pool.
+#
+# Command line:
+#   python Batch.py jobs.json more.toml --workers 4 --out Output
+#   python Batch.py jobs.json --metrics runs.jsonl
+#
+# A job file holds one job, or a list of them under "jobs"; in TOML the list is
+# an array of [[jobs]] tables. Each job has
+#   name          -> Run name, used for the output file names and plot titles
+#   e, l, r, phi  -> Launch energy, angular momentum, radius and angle, with
+#   outgoing      ->     true for dr/dtau > 0 (default false), or
+#   ur, up        ->     the launch 4-velocity components instead of e and l
+#   tau           -> Proper time span to integrate over
+#   deltaTime     -> Proper time between output rows (default 0.25)
+#   outputs       -> Any of "data", "compPlot", "paramPlot", "anim" (default
+#                    all four)
+#   dataFormat    -> ".dat" (default) or ".trj"
+#   animFormat    -> ".gif" (default), ".png"/".apng" or ".webp"
+#   animBackend   -> "matplotlib" (default) or "pillow", the renderer to draw
+#                    the animation frames with
+#   animWorkers   -> Processes to render the animation frames with (default 1)
+#   driftBudget   -> Optional largest drift in the conserved quantities to allow;
+#                    the loosest integrator tolerances meeting it are used
+################################################################################
+
+DEFAULT_BATCH_OUT_DIR = "Output"
+DEFAULT_BATCH_DELTA_TIME = 0.25
+BATCH_OUTPUTS = ["data", "compPlot", "paramPlot", "anim"]
+#Largest |u.u + 1| at launch that passes without a warning
+LAUNCH_TOLERANCE = 1e-9
+
+#Sub-directory and file name suffix of each output, as the GUI lays them out
+BATCH_OUTPUT_FILES = {
+    "data":["Simulation_Data", "_Data"],
+    "compPlot":["Component_Plots", "_Comp"],
+    "paramPlot":["Parametric_Plots", "_Param"],
+    "anim":["Animations", "_Anim"]
+}
+
+
+'''
+Reads the jobs out of a JSON or TOML job file
+################################################################################
+filename -> Job file; the format is picked from the extension
+################################################################################
+Return specs -> List of job dicts, as written in the file
+'''
+def readJobFile(filename):
+    if os.path.splitext(filename)[1].lower() == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            raise RuntimeError("TOML job files need Python 3.11 or newer (tomllib)")
+        with open(filename, 'rb') as file:
+            content = tomllib.load(file)
+    else:
+        with open(filename, 'r') as file:
+            content = json.load(file)
+    if isinstance(content, dict) and "jobs" in content:
+        return list(content["jobs"])
+    if isinstance(content, list):
+        return content
+    return [content]
+
+
+'''
+Turns a job as written in a job file into the job dict executeRun() takes
+################################################################################
+spec -> Job dict from a job file (see the top of this file)
+outDir -> Directory the output sub-directories go in
+cacheDir -> Optional ResultCache directory
+################################################################################
+Return job -> dict for Runner.executeRun()
+'''
+def makeJob(spec, outDir=DEFAULT_BATCH_OUT_DIR, cacheDir=None):
+    from Solver import Simulator
+
+    sim = Simulator()
+    name = spec["name"]
+    if "ur" in spec:
+        initialConditions = sim.initcondgen_ur_uw(spec["ur"], spec["up"], spec["r"],
+            spec.get("phi", 0))
+    else:
+        initialConditions = sim.initcondgen(spec["e"], spec["l"], spec["r"],
+            spec.get("phi", 0), bool(spec.get("outgoing", False)))
+
+    requested = spec.get("outputs", BATCH_OUTPUTS)
+    unknown = [output for output in requested if output not in BATCH_OUTPUTS]
+    if unknown:
+        raise ValueError("Job " + name + " asks for unknown outputs " + str(unknown))
+    extensions = {
+        "data":spec.get("dataFormat", ".dat"),
+        "compPlot":".png",
+        "paramPlot":".png",
+        "anim":spec.get("animFormat", ".gif")
+    }
+    paths = {}
+    for output, (subDir, suffix) in BATCH_OUTPUT_FILES.items():
+        directory = os.path.join(outDir, subDir)
+        os.makedirs(directory, exist_ok=True)
+        paths[output] = os.path.join(directory, name + suffix + extensions[output])
+
+    return {
+        "name":name,
+        "initialConditions":[float(val) for val in initialConditions],
+        "tSteps":spec["tau"],
+        "deltaTime":spec.get("deltaTime", DEFAULT_BATCH_DELTA_TIME),
+        "stopConditions":runStopConditions(sim, initialConditions),
+        "paths":paths,
+        "outputs":{output:output in requested for output in BATCH_OUTPUTS},
+        "cacheDir":cacheDir,
+        "driftBudget":spec.get("driftBudget"),
+        "animBackend":spec.get("animBackend", "matplotlib"),
+        "animWorkers":int(spec.get("animWorkers", 1))
+    }
+
+
+'''
+Pool entry point; runs one job and times each of its stages
+################################################################################
+job -> dict for Runner.executeRun()
+################################################################################
+Return summary -> dict with the job's "name", "status" ("done" or "error"),
+    "seconds" in total, "stages" (seconds per stage label, in order), and
+    "result" (output paths) or "error" (traceback)
+'''
+def batchJob(job):
+    import matplotlib
+    matplotlib.use("Agg")
+    import traceback
+
+    start = time.perf_counter()
+    #Imports and solver set up count until the run's first report
+    stages = [["Setting up", start]]
+
+    def report(fraction, label):
+        if stages[-1][0] != label:
+            stages.append([label, time.perf_counter()])
+
+    summary = {"name":job["name"]}
+    try:
+        summary["result"] = executeRun(job, report)
+        summary["status"] = "done"
+    except Exception:
+        summary["error"] = traceback.format_exc()
+        summary["status"] = "error"
+    end = time.perf_counter()
+
+    marks = [mark for label, mark in stages] + [end]
+    summary["stages"] = [[label.rstrip("."), marks[index + 1] - mark]
+        for index, (label, mark) in enumerate(stages) if label != "Done"]
+    summary["seconds"] = end - start
+    return summary
+
+
+'''
+Runs a set of jobs across a process pool
+################################################################################
+jobs -> List of dicts for Runner.executeRun(), e.g. from makeJob()
+workers -> Number of worker processes (defaults to the number of CPUs); 1 runs
+    the jobs one by one in this process
+onFinished -> Optional callback, passed each job's summary as it completes
+################################################################################
+Return summaries -> List of batchJob() summaries, in the order of jobs
+'''
+def runBatch(jobs, workers=None, onFinished=None):
+    summaries = [None]*len(jobs)
+    if workers == 1:
+        for index, job in enumerate(jobs):
+            summaries[index] = batchJob(job)
+            if onFinished is not None:
+                onFinished(summaries[index])
+        return summaries
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=SPAWN_CONTEXT) as pool:
+        futures = {pool.submit(batchJob, job):index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            summaries[futures[future]] = future.result()
+            if onFinished is not None:
+                onFinished(summaries[futures[future]])
+    return summaries
+
+
+'''
+Prints one line per job with its status and stage timings, then the totals
+################################################################################
+summaries -> List of batchJob() summaries
+wallSeconds -> Wall time of the whole batch
+################################################################################
+'''
+def printSummary(summaries, wallSeconds):
+    nameWidth = max([len(summary["name"]) for summary in summaries] + [4])
+    print("")
+    print("Job".ljust(nameWidth) + "  Status  Total (s)  Stages (s)")
+    for summary in summaries:
+        stages = ", ".join(label + " " + "%.2f" % seconds
+            for label, seconds in summary["stages"])
+        print(summary["name"].ljust(nameWidth) + "  " + summary["status"].ljust(6) +
+            "  " + ("%.2f" % summary["seconds"]).rjust(9) + "  " + stages)
+    busy = sum(summary["seconds"] for summary in summaries)
+    print("")
+    print(str(len(summaries)) + " jobs, " + "%.2f" % busy + " s of work in " +
+        "%.2f" % wallSeconds + " s")
+
+
+'''
+Command-line entry point
+################################################################################
+argv -> Arguments, without the program name
+################################################################################
+Return code -> Exit code; 1 if any job failed, 2 if a job file is invalid
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run orbit simulations from JSON/TOML job files, without the GUI")
+    parser.add_argument("jobFiles", nargs="+", help="JSON or TOML job files")
+    parser.add_argument("--workers", type=int, default=None,
+        help="Worker processes (default: one per CPU)")
+    parser.add_argument("--out", default=DEFAULT_BATCH_OUT_DIR,
+        help="Directory to write outputs under (default: %(default)s)")
+    parser.add_argument("--cache", default=None,
+        help="Directory of a result cache to reuse solutions from")
+    parser.add_argument("--metrics", default=None,
+        help="JSON lines file to append each finished job's metrics record to")
+    args = parser.parse_args(argv)
+
+    #Set up jobs (which imports the plotting code) on the headless backend too
+    import matplotlib
+    matplotlib.use("Agg")
+
+    #Check every job before starting any of them
+    jobs = []
+    for jobFile in args.jobFiles:
+        for index, spec in enumerate(readJobFile(jobFile)):
+            try:
+                jobs.append(makeJob(spec, args.out, args.cache))
+            except KeyError as e:
+                print(jobFile + ", job " + str(index + 1) + ": missing " + str(e))
+                return 2
+            except ValueError as e:
+                print(jobFile + ", job " + str(index + 1) + ": " + str(e))
+                return 2
+
+    def announce(summary):
+        print(summary["name"] + ": " + summary["status"] + " (" +
+            "%.2f" % summary["seconds"] + " s)")
+        if summary["status"] == "error":
+            print(summary["error"])
+            return
+        result = summary["result"]
+        drift = "  conservation drift %.1e" % result["drift"]["max"]
+        if "tuning" in result:
+            drift += " at rtol = atol = %.0e" % result["tuning"]["rtol"]
+            if not result["tuning"]["met"]:
+                drift += " (over budget even at the tightest tolerance)"
+        print(drift)
+        if result["drift"]["launchError"] > LAUNCH_TOLERANCE:
+            print("  launch 4-velocity is off normalization by %.1e" %
+                result["drift"]["launchError"])
+        if args.metrics is not None:
+            writeRecord(args.metrics, result["metrics"])
+
+    start = time.perf_counter()
+    summaries = runBatch(jobs, args.workers, announce)
+    printSummary(summaries, time.perf_counter() - start)
+    return 0 if all(summary["status"] == "done" for summary in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
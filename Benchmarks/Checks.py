@@ -0,0 +1,141 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+################################################################################
+# Quick end-to-end checks of behaviour that is easy to break without noticing:
+# each check runs the real code on a small case and reports what went wrong, if
+# anything.
+#
+# Command line (from anywhere):
+#   python Benchmarks/Checks.py
+#   python Benchmarks/Checks.py --only runQueueParallelAnim
+#
+# Exits with 1 if any check fails.
+################################################################################
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+#Longest a queued run may take before the check gives up on it
+RUN_TIMEOUT = 300
+
+
+'''
+Runs a job through a RunQueue (the GUI's path) with its animation rendered on a
+pool of 2 processes, which a daemonic run process isn't allowed to start
+################################################################################
+Return problems -> List of what went wrong (empty if nothing did)
+'''
+def checkRunQueueParallelAnim():
+    from Batch import makeJob
+    from Runner import RunQueue
+
+    outDir = tempfile.mkdtemp()
+    job = makeJob({"name":"Check", "e":0.97, "l":4.0, "r":20, "tau":500,
+        "outputs":["anim"], "animWorkers":2}, outDir)
+    finished = []
+    runQueue = RunQueue(onFinished=lambda job, status, payload:
+        finished.append([status, payload]))
+    runQueue.submit(job)
+    start = time.perf_counter()
+    while not finished:
+        if time.perf_counter() - start > RUN_TIMEOUT:
+            runQueue.cancelAll()
+            return ["Run didn't finish within " + str(RUN_TIMEOUT) + " s"]
+        runQueue.poll()
+        time.sleep(0.1)
+
+    status, payload = finished[0]
+    if status != "done":
+        return ["Run ended with status " + status + ":\n" + str(payload)]
+    if not os.path.isfile(job["paths"]["anim"]):
+        return ["Run finished without writing " + job["paths"]["anim"]]
+    return []
+
+
+'''
+Runs jobs with both plots in this process, the way a batch pool worker does,
+and makes sure they leave no matplotlib figures open behind them
+################################################################################
+Return problems -> List of what went wrong (empty if nothing did)
+'''
+def checkRunsCloseFigures():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from Batch import makeJob
+    from Runner import executeRun
+
+    outDir = tempfile.mkdtemp()
+    before = len(plt.get_fignums())
+    for index in range(3):
+        job = makeJob({"name":"Check" + str(index), "e":0.97, "l":4.0, "r":20,
+            "tau":500, "outputs":["compPlot", "paramPlot"]}, outDir)
+        executeRun(job, lambda fraction, label: None)
+    left = len(plt.get_fignums()) - before
+    if left:
+        return [str(left) + " figures left open after 3 runs"]
+    return []
+
+
+'''
+Classifies exactly circular launches at a range of radii, whose effective
+potential cubic has a double root that round-off can push either way
+################################################################################
+Return problems -> List of what went wrong (empty if nothing did)
+'''
+def checkCircularOrbits():
+    import numpy as np
+    from Solver import ORBIT_BOUND, Simulator
+
+    sim = Simulator()
+    problems = []
+    for r in [6.5, 7, 10, 20, 50, 100, 1000]:
+        l = np.sqrt((r**2)/(r-3))
+        e = (1-2/r)/np.sqrt(1-3/r)
+        info = sim.classifyOrbit(e, l, r, True)
+        if info["class"] != ORBIT_BOUND or not np.allclose(
+            [info["periapsis"], info["apoapsis"]], r, rtol=1e-6, atol=0):
+            problems.append("Circular orbit at r = " + str(r) + " came out as class " +
+                str(int(info["class"])) + ", periapsis " + str(float(info["periapsis"])) +
+                ", apoapsis " + str(float(info["apoapsis"])))
+    return problems
+
+
+CHECKS = {
+    "runQueueParallelAnim":checkRunQueueParallelAnim,
+    "runsCloseFigures":checkRunsCloseFigures,
+    "circularOrbits":checkCircularOrbits
+}
+
+
+'''
+Command-line entry point
+################################################################################
+argv -> Arguments, without the program name
+################################################################################
+Return code -> Exit code; 1 if any check failed
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run quick end-to-end checks")
+    parser.add_argument("--only", nargs="+", default=None, choices=list(CHECKS),
+        help="Checks to run (default: all of them)")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for name in args.only or list(CHECKS):
+        problems = CHECKS[name]()
+        print(name.ljust(24) + ("ok" if not problems else "FAILED"))
+        for problem in problems:
+            print("  " + problem.replace("\n", "\n  "))
+        failed += bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+################################################################################
+# Measures what importing each module costs a fresh interpreter, the way every
+# sweep, batch or GUI run worker pays it: wall time of the import, peak memory
+# of the process afterwards, and which of the heavy plotting packages it pulled
+# in. Each module is imported in its own new process, several times over, and
+# the median is reported.
+#
+# Command line (from anywhere):
+#   python Benchmarks/ImportTime.py
+#   python Benchmarks/ImportTime.py Solver Sweep --repeats 10 --check
+#
+# --check exits with 1 if any of the solver-only modules (SOLVER_MODULES) loads
+# matplotlib or Pillow, so the split between Solver and Plotting stays put.
+################################################################################
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["Solver", "Sweep", "Pipeline", "Stream", "Cache", "Runner",
+    "Plotting", "Window"]
+#Modules that only integrate orbits, and so should never need plotting
+SOLVER_MODULES = ["Solver", "Sweep", "Pipeline", "Stream", "Cache", "Runner"]
+HEAVY_PACKAGES = ["matplotlib", "PIL", "tkinter", "scipy", "numpy"]
+DEFAULT_REPEATS = 5
+
+#Run in each child; times the import and reports back as one line of JSON
+CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import %s
+seconds = time.perf_counter() - start
+try:
+    import resource
+    peakKb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peakKb //= 1024
+except ImportError:
+    peakKb = None
+print(json.dumps({"seconds":seconds, "peakKb":peakKb,
+    "loaded":[name for name in %r if name in sys.modules]}))
+'''
+
+
+'''
+Imports a module in a fresh interpreter and measures it
+################################################################################
+module -> Name of the module to import (None for a bare interpreter)
+################################################################################
+Return sample -> dict with the import's "seconds", the process's "peakKb"
+    (None where unavailable) and which HEAVY_PACKAGES ended up "loaded"
+'''
+def timeImport(module):
+    script = CHILD_SCRIPT % (module if module is not None else "sys", HEAVY_PACKAGES)
+    env = dict(os.environ)
+    env["MPLBACKEND"] = "Agg"
+    env["PYTHONPATH"] = REPO_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    completed = subprocess.run([sys.executable, "-c", script], cwd=REPO_DIR,
+        env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError("Importing " + str(module) + " failed:\n" + completed.stderr)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+'''
+Measures a module's import several times over
+################################################################################
+module -> Name of the module to import (None for a bare interpreter)
+repeats -> Number of fresh interpreters to import it in
+################################################################################
+Return result -> dict with the "module", median "seconds" and "peakKb", and the
+    "loaded" HEAVY_PACKAGES
+'''
+def benchmarkImport(module, repeats=DEFAULT_REPEATS):
+    samples = [timeImport(module) for i in range(repeats)]
+    peaks = [sample["peakKb"] for sample in samples if sample["peakKb"] is not None]
+    return {
+        "module":module if module is not None else "(interpreter)",
+        "seconds":statistics.median(sample["seconds"] for sample in samples),
+        "peakKb":statistics.median(peaks) if peaks else None,
+        "loaded":samples[-1]["loaded"]
+    }
+
+
+'''
+Prints one line per module
+################################################################################
+results -> List of benchmarkImport() results
+################################################################################
+'''
+def printResults(results):
+    nameWidth = max(len(result["module"]) for result in results)
+    print("Module".ljust(nameWidth) + "  Import (ms)  Peak RSS (MB)  Loaded")
+    for result in results:
+        peak = "-" if result["peakKb"] is None else "%.1f" % (result["peakKb"]/1024)
+        print(result["module"].ljust(nameWidth) + "  " +
+            ("%.1f" % (result["seconds"]*1000)).rjust(11) + "  " + peak.rjust(13) +
+            "  " + ", ".join(result["loaded"]))
+
+
+'''
+Command-line entry point
+################################################################################
+argv -> Arguments, without the program name
+################################################################################
+Return code -> Exit code; 1 if --check was given and a solver-only module
+    loaded matplotlib or Pillow
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the cost of importing each module in a fresh interpreter")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES,
+        help="Modules to import (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+        help="Fresh interpreters per module (default: %(default)s)")
+    parser.add_argument("--json", action="store_true",
+        help="Print the results as JSON instead of a table")
+    parser.add_argument("--check", action="store_true",
+        help="Fail if a solver-only module loads matplotlib or Pillow")
+    args = parser.parse_args(argv)
+
+    results = [benchmarkImport(None, args.repeats)]
+    for module in args.modules:
+        try:
+            results.append(benchmarkImport(module, args.repeats))
+        except RuntimeError as e:
+            #e.g. Window without tkinter
+            print(str(e), file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        printResults(results)
+
+    if args.check:
+        offenders = [result["module"] for result in results
+            if result["module"] in SOLVER_MODULES
+            and ("matplotlib" in result["loaded"] or "PIL" in result["loaded"])]
+        if offenders:
+            print("Loads plotting packages: " + ", ".join(offenders), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
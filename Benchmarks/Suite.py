@@ -0,0 +1,451 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+################################################################################
+# Benchmark suite for every stage of a run: the equations of motion, solves,
+# data file writes and reads, coordinate conversion, plots and animations, plus
+# scaling curves of solve time against rows, orbits and worker processes.
+#
+# Command line (from anywhere):
+#   python Benchmarks/Suite.py --save results.json
+#   python Benchmarks/Suite.py --baseline results.json --tolerance 0.25
+#   python Benchmarks/Suite.py --quick --only solve scaling/rows
+#
+# Every case is timed a few times over and both the median and the fastest time
+# per call are kept; results are written as JSON of the form
+#   {"meta":{...}, "results":{name:{"seconds", "min", "repeats"}},
+#    "scaling":{curve:[[size, seconds], ...]}}
+# Against a baseline, a case regresses when its fastest time is more than
+# tolerance slower than the baseline's, and the exit code is then 1.
+################################################################################
+
+#The golden inputs from the Schwarzschild tests at the bottom of Solver.py
+ISCO_CONDITIONS = [6, 0, 1.5, 0, 1.5/(6*6**0.5)]
+ECCENTRIC_LAUNCH = [.97, 4.3, 30, 0, False]
+GOLDEN_DATA_DIR = os.path.join(REPO_DIR, "Output", "Simulation_Data")
+FIELD_NAMES = ["tau","r","phi","dt/dtau","dr/dtau","dphi/dtau"]
+
+DEFAULT_REPEATS = 5
+DEFAULT_TOLERANCE = 0.25
+#Sizes of each scaling curve, full and --quick
+IO_ROWS = [[1000, 10000, 100000], [1000, 10000]]
+SOLVE_ROWS = [[1000, 4000, 16000, 64000], [1000, 4000, 16000]]
+BATCH_ORBITS = [[1, 16, 128, 1024], [1, 16, 128]]
+ANIMATION_FRAMES = [100, 30]
+#Proper time per output row for the row scaling curve
+ROW_SPACING = 0.2
+
+
+'''
+Times a call, keeping the median and fastest of several repeats
+################################################################################
+call -> Function of no arguments to time
+repeats -> Number of timed repeats
+number -> Calls per repeat, for calls too quick to time one at a time
+################################################################################
+Return measurement -> dict of the "seconds" (median) and "min" per call, and
+    the number of "repeats"
+'''
+def measure(call, repeats=DEFAULT_REPEATS, number=1):
+    samples = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        for i in range(number):
+            call()
+        samples.append((time.perf_counter() - start)/number)
+    return {"seconds":statistics.median(samples), "min":min(samples),
+        "repeats":repeats}
+
+
+class BenchmarkSuite():
+
+    '''
+    Sets up a suite run
+    ################################################################################
+    workDir -> Directory for the files the cases write
+    quick -> Use the smaller sizes, for a fast check
+    repeats -> Timed repeats per case
+    only -> Optional list of name prefixes; other cases are skipped
+    ################################################################################
+    '''
+    def __init__(self, workDir, quick=False, repeats=DEFAULT_REPEATS, only=None):
+        from Solver import Simulator
+
+        self.sim = Simulator()
+        self.workDir = workDir
+        self.size = 1 if quick else 0
+        self.repeats = repeats
+        self.only = only
+        self.results = {}
+
+    '''
+    Checks whether a case (or group of cases) was asked for
+    ################################################################################
+    name -> Case name, or the prefix shared by a group of cases
+    ################################################################################
+    '''
+    def wanted(self, name):
+        if not self.only:
+            return True
+        return any(name.startswith(prefix) or prefix.startswith(name)
+            for prefix in self.only)
+
+    '''
+    Times one case and records it
+    ################################################################################
+    name -> Case name, "group/case[/size]"
+    call, number -> As for measure()
+    ################################################################################
+    '''
+    def time(self, name, call, number=1):
+        if not self.wanted(name):
+            return
+        self.results[name] = measure(call, self.repeats, number)
+        print(name.ljust(40) + formatSeconds(self.results[name]["seconds"]).rjust(12),
+            flush=True)
+
+    '''
+    Solution data for the other cases
+    ################################################################################
+    rows -> Number of rows of the eccentric golden orbit to solve for
+    ################################################################################
+    Return [tau, rVals] -> The proper times and solution rows
+    '''
+    def orbitData(self, rows):
+        import numpy as np
+
+        tau = np.linspace(0, rows*ROW_SPACING, rows)
+        initConds = self.sim.initcondgen(*ECCENTRIC_LAUNCH)
+        return [tau, self.sim.getSolData(initConds, tau, self.sim.Schwarzschild)]
+
+    '''
+    Equations of motion, per call
+    ################################################################################
+    '''
+    def benchDerivatives(self):
+        import numpy as np
+
+        state = np.array(ISCO_CONDITIONS, dtype=float)
+        self.time("rhs/Schwarzschild", lambda: self.sim.Schwarzschild(state, 0),
+            number=20000)
+        states = np.tile(state, (1024, 1)).ravel()
+        self.time("rhs/SchwarzschildBatch/1024", lambda: self.sim.SchwarzschildBatch(states, 0),
+            number=2000)
+
+    '''
+    Full solves of the golden orbits, with each integrator
+    ################################################################################
+    '''
+    def benchSolves(self):
+        import numpy as np
+
+        sim = self.sim
+        iscoTau = np.linspace(0, 100, 10000)
+        self.time("solve/isco", lambda: sim.getSolData(ISCO_CONDITIONS, iscoTau,
+            sim.Schwarzschild))
+        initConds = sim.initcondgen(*ECCENTRIC_LAUNCH)
+        tau = np.linspace(0, 2000, 10000)
+        self.time("solve/eccentric", lambda: sim.getSolData(initConds, tau,
+            sim.Schwarzschild))
+        self.time("solve/eccentric/reduced", lambda: sim.getSolData(initConds, tau,
+            sim.Schwarzschild, reduced=True))
+        self.time("solve/eccentric/events", lambda: sim.getSolDataEvents(initConds,
+            tau, sim.Schwarzschild))
+
+    '''
+    Data file writes and reads, in both formats, at several sizes
+    ################################################################################
+    '''
+    def benchFiles(self):
+        if not self.wanted("write") and not self.wanted("read"):
+            return
+        for rows in IO_ROWS[self.size]:
+            tau, rVals = self.orbitData(rows)
+            for extension in [".dat", ".trj"]:
+                filename = os.path.join(self.workDir, "io_" + str(rows) + extension)
+                kind = extension[1:] + "/" + str(rows)
+                self.time("write/" + kind, lambda: self.sim.writeSolArray(filename,
+                    tau, rVals, FIELD_NAMES))
+                self.time("read/" + kind, lambda: self.sim.readSolData(filename)[1].sum())
+
+        if os.path.isdir(GOLDEN_DATA_DIR):
+            for name in sorted(os.listdir(GOLDEN_DATA_DIR)):
+                filename = os.path.join(GOLDEN_DATA_DIR, name)
+                self.time("read/golden/" + os.path.splitext(name)[0],
+                    lambda: self.sim.readSolData(filename))
+
+    '''
+    Polar to Cartesian conversion of a long run
+    ################################################################################
+    '''
+    def benchConversion(self):
+        import numpy as np
+
+        if not self.wanted("paramConversion"):
+            return
+        tau, rVals = self.orbitData(IO_ROWS[self.size][-1])
+        out = np.empty((rVals.shape[0], 2))
+        self.time("paramConversion", lambda: self.sim.paramConversion(rVals, [0, 1]),
+            number=20)
+        self.time("paramConversion/out", lambda: self.sim.paramConversion(rVals,
+            [0, 1], out), number=20)
+
+    '''
+    Component and parametric plots and animations, saved to file
+    ################################################################################
+    '''
+    def benchPlots(self):
+        import numpy as np
+        import matplotlib.pyplot as plt
+
+        if not self.wanted("plot") and not self.wanted("anim"):
+            return
+        tau, rVals = self.orbitData(10000)
+        solData = [FIELD_NAMES, np.column_stack([tau, rVals])]
+        sim = self.sim
+
+        def plot(shouldParameterize, filename):
+            sim.plotSolData(solData, shouldParameterize, False, True,
+                filename=os.path.join(self.workDir, filename), timeUnits="M",
+                labels=FIELD_NAMES, yUnits=['M', 'M', "rad", "", "", "rad/M"],
+                paramUnits=["M", "M"], dataNames=["r", "phi"],
+                conversion=sim.paramConversion)
+            plt.close("all")
+
+        self.time("plot/components", lambda: plot(False, "comp.png"))
+        self.time("plot/parametric", lambda: plot(True, "param.png"))
+
+        frames = ANIMATION_FRAMES[self.size]
+        for backend in ["matplotlib", "pillow"]:
+            for extension in [".gif", ".webp"]:
+                filename = os.path.join(self.workDir, "anim_" + backend + extension)
+                self.time("anim/" + backend + "/" + extension[1:],
+                    lambda: sim.makeAnimation(solData, False, True, dataNames=["r", "phi"],
+                        conversion=sim.paramConversion, filename=filename,
+                        frameCount=frames, backend=backend))
+
+    '''
+    Scaling curves: solve time against rows, batched orbits and sweep workers
+    ################################################################################
+    '''
+    def benchScaling(self):
+        import numpy as np
+        from Sweep import ParameterSweep
+
+        initConds = self.sim.initcondgen(*ECCENTRIC_LAUNCH)
+        for rows in SOLVE_ROWS[self.size]:
+            tau = np.linspace(0, rows*ROW_SPACING, rows)
+            self.time("scaling/rows/" + str(rows), lambda: self.sim.getSolData(initConds,
+                tau, self.sim.Schwarzschild))
+
+        batchTau = np.linspace(0, 100, 1000)
+        for orbits in BATCH_ORBITS[self.size]:
+            conditions = np.tile(initConds, (orbits, 1))
+            #Spread the launch radii so the orbits aren't all identical
+            conditions[:, 0] += np.linspace(0, 1, orbits)
+            self.time("scaling/orbits/" + str(orbits), lambda: self.sim.solveBatch(
+                conditions, batchTau))
+
+        #Every point of this grid plunges, so every point is integrated
+        sweep = ParameterSweep.makeGrid(np.linspace(0.95, 0.99, 8),
+            np.linspace(2, 3.4, 8 if self.size else 16), 20, tauMax=2000)
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            self.time("scaling/cores/" + str(workers), lambda: sweep.run(workers=workers,
+                chunkSize=8))
+            workers *= 2
+
+    '''
+    Runs every case
+    ################################################################################
+    Return report -> dict of "meta", "results" and "scaling", see the top of
+        this file
+    '''
+    def run(self):
+        self.benchDerivatives()
+        self.benchSolves()
+        self.benchFiles()
+        self.benchConversion()
+        self.benchPlots()
+        self.benchScaling()
+        return {"meta":runInfo(), "results":self.results,
+            "scaling":scalingCurves(self.results)}
+
+
+'''
+Formats a time per call with a sensible unit
+################################################################################
+'''
+def formatSeconds(seconds):
+    if seconds < 1e-3:
+        return "%.2f us" % (seconds*1e6)
+    if seconds < 1:
+        return "%.2f ms" % (seconds*1e3)
+    return "%.3f s" % seconds
+
+
+'''
+Describes the machine and software the suite ran on, so results from different
+set-ups aren't compared unknowingly
+################################################################################
+'''
+def runInfo():
+    import numpy
+    import scipy
+    import matplotlib
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+            capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "date":datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit":commit,
+        "python":platform.python_version(),
+        "numpy":numpy.__version__,
+        "scipy":scipy.__version__,
+        "matplotlib":matplotlib.__version__,
+        "platform":platform.platform(),
+        "cpus":os.cpu_count()
+    }
+
+
+'''
+Collects the "scaling/<curve>/<size>" cases into curves
+################################################################################
+results -> dict of case name -> measurement
+################################################################################
+Return curves -> dict of curve name -> [[size, seconds], ...], by size
+'''
+def scalingCurves(results):
+    curves = {}
+    for name, measurement in results.items():
+        parts = name.split("/")
+        if len(parts) == 3 and parts[0] == "scaling":
+            curves.setdefault(parts[1], []).append([int(parts[2]), measurement["seconds"]])
+    for points in curves.values():
+        points.sort()
+    return curves
+
+
+'''
+Prints each scaling curve, with how its time grows with size (the slope on a
+log-log plot: 1 is linear, 0 is flat)
+################################################################################
+'''
+def printCurves(curves):
+    import numpy as np
+
+    for curve, points in curves.items():
+        print("")
+        print(curve + " scaling:")
+        for size, seconds in points:
+            print("  " + str(size).rjust(8) + "  " + formatSeconds(seconds).rjust(12))
+        if len(points) > 1:
+            sizes, seconds = np.log(np.array(points, dtype=float)).T
+            print("  log-log slope %.2f" % np.polyfit(sizes, seconds, 1)[0])
+
+
+'''
+Compares results against a baseline
+################################################################################
+results -> dict of case name -> measurement
+baseline -> The same, from an earlier run
+tolerance -> Fraction a case's fastest time may grow by before it counts as a
+    regression
+################################################################################
+Return regressions -> List of the names of the cases that regressed
+'''
+def compareResults(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    nameWidth = max([len(name) for name in results] + [4])
+    print("")
+    print("Case".ljust(nameWidth) + "         Now    Baseline   Change")
+    for name, measurement in results.items():
+        if name not in baseline:
+            print(name.ljust(nameWidth) + formatSeconds(measurement["min"]).rjust(12) +
+                "           -      new")
+            continue
+        ratio = measurement["min"]/baseline[name]["min"]
+        status = ""
+        if ratio > 1 + tolerance:
+            status = "  SLOWER"
+            regressions.append(name)
+        elif ratio < 1/(1 + tolerance):
+            status = "  faster"
+        print(name.ljust(nameWidth) + formatSeconds(measurement["min"]).rjust(12) +
+            formatSeconds(baseline[name]["min"]).rjust(12) +
+            ("%+.0f%%" % ((ratio - 1)*100)).rjust(9) + status)
+    return regressions
+
+
+'''
+Command-line entry point
+################################################################################
+argv -> Arguments, without the program name
+################################################################################
+Return code -> Exit code; 1 if any case regressed against the baseline
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time every stage of a run and compare against a baseline")
+    parser.add_argument("--save", default=None,
+        help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+        help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+        help="Slowdown (as a fraction) that counts as a regression (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+        help="Timed repeats per case (default: %(default)s)")
+    parser.add_argument("--quick", action="store_true",
+        help="Smaller sizes, for a fast check")
+    parser.add_argument("--only", nargs="+", default=None,
+        help="Only run cases whose names start with one of these")
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+
+    workDir = tempfile.mkdtemp(prefix="precession_bench_")
+    try:
+        report = BenchmarkSuite(workDir, args.quick, args.repeats, args.only).run()
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    printCurves(report["scaling"])
+    if args.save is not None:
+        with open(args.save, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if baseline is not None:
+        regressions = compareResults(report["results"], baseline["results"],
+            args.tolerance)
+        if regressions:
+            print("")
+            print(str(len(regressions)) + " case(s) slower than the baseline by more than " +
+                "%.0f%%: " % (args.tolerance*100) + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+import numpy as np
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+
+################################################################################
+# On-disk cache of integration results, keyed by a hash of everything that
+# determines them (initial conditions, independent variable grid, equations,
+# mass, integrator and tolerances), so repeating a run - or a sweep point that
+# an earlier sweep already covered - is a file read instead of a solve.
+#
+# Each entry is a single uncompressed .npz file of named arrays plus a SHA-256
+# checksum of their contents; entries that fail the check are thrown away and
+# recomputed. The directory is kept under a size limit by evicting the least
+# recently used entries (recency is the file's modification time, bumped on
+# every hit). Writes go through a temporary file and an atomic rename, so
+# several processes (e.g. sweep workers) can share one cache.
+#
+# Functions can only be keyed by name, so only module level functions and bound
+# methods (keyed by their class and method name) are cached; a result depending
+# on a lambda, a closure or a functools.partial is always recomputed, since two
+# of those with the same name can compute different things.
+################################################################################
+
+#Bump whenever the equations of motion or the stored layout change, so stale
+#entries stop matching
+CACHE_VERSION = 3
+CACHE_EXTENSION = ".npz"
+DEFAULT_CACHE_BYTES = 512*1024*1024
+
+
+'''
+Raised by keyPart() for a key component that can't be keyed reliably; the result
+should be computed without the cache
+'''
+class UncacheableError(ValueError):
+    pass
+
+
+'''
+Canonical, hashable form of one key component; arrays (and lists of numbers,
+which key the same as the equivalent array) are reduced to a digest of their
+values, and functions to their qualified names
+################################################################################
+value -> Key component
+################################################################################
+'''
+def keyPart(value):
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value, dtype=float)
+        return {"shape":list(data.shape), "sha256":hashlib.sha256(data.tobytes()).hexdigest()}
+    if inspect.ismethod(value):
+        owner = type(value.__self__)
+        return owner.__module__ + "." + owner.__qualname__ + "." + value.__func__.__name__
+    if inspect.isfunction(value):
+        if value.__name__ == "<lambda>" or "<locals>" in value.__qualname__:
+            raise UncacheableError("Can't key " + value.__qualname__)
+        return value.__module__ + "." + value.__qualname__
+    if callable(value):
+        raise UncacheableError("Can't key " + repr(value))
+    if isinstance(value, dict):
+        return {str(key):keyPart(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        #Numeric lists key like arrays, so passing either gives the same entry
+        try:
+            numeric = np.asarray(value)
+        except ValueError:
+            numeric = None
+        if numeric is not None and numeric.dtype.kind in "iuf":
+            return keyPart(numeric)
+        return [keyPart(val) for val in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+'''
+Digest of a set of named arrays, used to check entries when they are read back
+################################################################################
+arrays -> dict of name -> array
+################################################################################
+'''
+def arraysChecksum(arrays):
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(name.encode("utf-8"))
+        digest.update(str(array.dtype).encode("utf-8"))
+        digest.update(str(array.shape).encode("utf-8"))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache():
+
+    '''
+    Opens (creating if needed) a cache directory
+    ################################################################################
+    directory -> Where the entries are kept
+    maxBytes -> Size the directory is trimmed back to after each new entry
+    ################################################################################
+    '''
+    def __init__(self, directory, maxBytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+    '''
+    Builds the key for a result
+    ################################################################################
+    parts -> dict of everything the result depends on; arrays, functions and
+        nested lists/dicts are all fine
+    ################################################################################
+    Return key -> Hex digest naming the entry; raises UncacheableError if a part
+        can't be keyed (see keyPart())
+    '''
+    def makeKey(self, parts):
+        canonical = json.dumps({"version":CACHE_VERSION, "parts":keyPart(parts)},
+            sort_keys=True)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    '''
+    Path of the file holding an entry
+    ################################################################################
+    '''
+    def entryPath(self, key):
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    '''
+    Looks up an entry
+    ################################################################################
+    key -> Key from makeKey()
+    ################################################################################
+    Return arrays -> dict of the stored arrays, or None on a miss (including
+        entries that are unreadable or fail their checksum, which are removed)
+    '''
+    def get(self, key):
+        path = self.entryPath(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                arrays = {name:entry[name] for name in entry.files}
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.discard(key)
+            return None
+        checksum = str(arrays.pop("checksum", ""))
+        if checksum != arraysChecksum(arrays):
+            self.discard(key)
+            return None
+        #Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arrays
+
+    '''
+    Stores an entry, then evicts old entries if the cache is over its size limit
+    ################################################################################
+    key -> Key from makeKey()
+    arrays -> dict of name -> array to store (no object arrays)
+    ################################################################################
+    Return True -> Returns true if the entry was stored
+    '''
+    def put(self, key, arrays):
+        arrays = {name:np.asarray(array) for name, array in arrays.items()}
+        handle, tempPath = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.savez(file, checksum=np.array(arraysChecksum(arrays)), **arrays)
+            os.replace(tempPath, self.entryPath(key))
+        except BaseException:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+        self.evict()
+        return True
+
+    '''
+    Removes one entry, if it exists
+    ################################################################################
+    '''
+    def discard(self, key):
+        try:
+            os.remove(self.entryPath(key))
+        except FileNotFoundError:
+            pass
+
+    '''
+    Deletes least recently used entries until the cache fits in maxBytes
+    ################################################################################
+    Return removed -> Number of entries deleted
+    '''
+    def evict(self):
+        entries = []
+        total = 0
+        for item in os.scandir(self.directory):
+            if not item.name.endswith(CACHE_EXTENSION):
+                continue
+            try:
+                stat = item.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, item.path))
+            total += stat.st_size
+
+        removed = 0
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return removed
+
+    '''
+    Deletes every entry
+    ################################################################################
+    '''
+    def clear(self):
+        for item in os.scandir(self.directory):
+            if item.name.endswith(CACHE_EXTENSION):
+                try:
+                    os.remove(item.path)
+                except FileNotFoundError:
+                    pass
+        return True
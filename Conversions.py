@@ -0,0 +1,115 @@
+import numpy as np
+
+################################################################################
+# R^N -> R^2 (or R^3) mappings for the conversion argument of
+# Simulator.plotSolData() and Simulator.makeAnimation()
+#
+# Every conversion takes the full (N, V) data array and a list of column
+# indices, and writes its result into out if one is given (allocating it
+# otherwise). All of them work on whole columns at once and allocate no
+# temporaries of their own, so a buffer can be reused from call to call.
+################################################################################
+
+
+'''
+Allocates the output buffer for a conversion if the caller didn't pass one
+################################################################################
+arr2 -> 2D (N, V) array being converted
+width -> Number of output columns
+out -> Caller's buffer, or None
+################################################################################
+'''
+def prepareOutput(arr2, width, out):
+    if out is None:
+        return np.empty((arr2.shape[0], width))
+    if out.shape != (arr2.shape[0], width):
+        raise ValueError("Output buffer must have shape " + str((arr2.shape[0], width)))
+    return out
+
+
+'''
+Default mapping; truncates the passed array to the columns specified by their
+    index in locs
+################################################################################
+arr2 -> 2D (N, V) array containing some time and/or axis data
+locs -> A list of V' distinct indices of the columns we want as output
+out -> Optional (N, V') buffer to write into
+################################################################################
+Return out -> A 2D (N, V') array holding just the selected columns
+'''
+def selectColumns(arr2, locs, out=None):
+    out = prepareOutput(arr2, len(locs), out)
+    for outIndex, col in enumerate(locs):
+        out[:, outIndex] = arr2[:, col]
+    return out
+
+
+'''
+Maps 2D polar to 2D Cartesian coordinates via x = r cos(phi), y = r sin(phi)
+################################################################################
+arr2 -> 2D (N, V) array containing some time and/or axis data
+locs -> [r, phi] column indices
+out -> Optional (N, 2) buffer to write into
+################################################################################
+Return out -> A 2D (N, 2) array of x, y
+'''
+def polarToCartesian(arr2, locs, out=None):
+    out = prepareOutput(arr2, 2, out)
+    r = arr2[:, locs[0]]
+    phi = arr2[:, locs[1]]
+    np.cos(phi, out=out[:, 0])
+    np.multiply(out[:, 0], r, out=out[:, 0])
+    np.sin(phi, out=out[:, 1])
+    np.multiply(out[:, 1], r, out=out[:, 1])
+    return out
+
+
+'''
+Swaps proper time for Schwarzschild coordinate time, integrating dt/dtau along
+    the trajectory with the trapezoid rule (t = 0 at the first row)
+################################################################################
+arr2 -> 2D (N, V) array containing some time and/or axis data
+locs -> [tau, dt/dtau, value] column indices
+out -> Optional (N, 2) buffer to write into
+################################################################################
+Return out -> A 2D (N, 2) array of coordinate time and the value column
+'''
+def coordinateTime(arr2, locs, out=None):
+    out = prepareOutput(arr2, 2, out)
+    tau = arr2[:, locs[0]]
+    dtdtau = arr2[:, locs[1]]
+    #Use the second output column as scratch space for the step sizes before
+    #it receives the values
+    out[0, 0] = 0
+    np.subtract(tau[1:], tau[:-1], out=out[1:, 1])
+    np.add(dtdtau[1:], dtdtau[:-1], out=out[1:, 0])
+    np.multiply(out[1:, 0], out[1:, 1], out=out[1:, 0])
+    np.multiply(out[1:, 0], 0.5, out=out[1:, 0])
+    np.cumsum(out[:, 0], out=out[:, 0])
+    out[:, 1] = arr2[:, locs[2]]
+    return out
+
+
+'''
+Lifts the orbit onto the embedding diagram of the equatorial plane (Flamm's
+    paraboloid, z = 2 sqrt(2m(r - 2m))); the first two columns are the same x, y
+    as polarToCartesian(), so it can be passed anywhere a 2D conversion is
+    expected
+################################################################################
+arr2 -> 2D (N, V) array containing some time and/or axis data
+locs -> [r, phi] column indices
+out -> Optional (N, 3) buffer to write into
+m -> Mass of the central body
+################################################################################
+Return out -> A 2D (N, 3) array of x, y, z (z is NaN inside the horizon)
+'''
+def embeddingLift(arr2, locs, out=None, m=1):
+    out = prepareOutput(arr2, 3, out)
+    polarToCartesian(arr2, locs, out=out[:, :2])
+    r = arr2[:, locs[0]]
+    np.subtract(r, 2*m, out=out[:, 2])
+    np.multiply(out[:, 2], 2*m, out=out[:, 2])
+    with np.errstate(invalid='ignore'):
+        np.sqrt(out[:, 2], out=out[:, 2])
+    np.multiply(out[:, 2], 2, out=out[:, 2])
+    return out
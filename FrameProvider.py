@@ -0,0 +1,238 @@
+import threading
+import zlib
+from collections import OrderedDict
+from PIL import Image, ImageChops, ImageTk
+
+################################################################################
+# Random access to the frames of an animation file (GIF, APNG or WebP) for the
+# viewer, without holding every decoded frame in memory
+#
+# Pillow can only decode animations front to back, so one background pass
+# builds an index instead: every KEYFRAME_INTERVAL-th frame is kept whole
+# (zlib compressed), and every other frame only as the box of pixels that
+# changed since the one before it. Any frame can then be rebuilt from the
+# keyframe before it plus a handful of small patches. Rebuilt frames go in a
+# bounded LRU cache, which a worker thread keeps topped up ahead of the
+# playhead.
+################################################################################
+
+DEFAULT_FRAME_CACHE = 64
+DEFAULT_PHOTO_CACHE = 32
+DEFAULT_PREFETCH = 24
+KEYFRAME_INTERVAL = 32
+
+
+class FrameProvider():
+
+    '''
+    Opens an animation and starts indexing it in the background; frame 0 is
+    decoded straight away so it can be shown before indexing finishes
+    ################################################################################
+    filename -> Animation file to read
+    cacheSize -> Most rebuilt frames kept in memory at once
+    photoCacheSize -> Most Tk images kept at once (see getPhoto())
+    prefetch -> Number of frames rebuilt ahead of the playhead
+    keyframeInterval -> Frames between whole stored frames; larger uses less
+        memory but makes seeking slower
+    ################################################################################
+    '''
+    def __init__(self, filename, cacheSize=DEFAULT_FRAME_CACHE,
+        photoCacheSize=DEFAULT_PHOTO_CACHE, prefetch=DEFAULT_PREFETCH,
+        keyframeInterval=KEYFRAME_INTERVAL):
+        self.filename = filename
+        self.cacheSize = cacheSize
+        self.photoCacheSize = photoCacheSize
+        self.prefetch = prefetch
+        self.keyframeInterval = keyframeInterval
+
+        self.mode = None
+        self.size = None
+        self.keyframes = []
+        #One (box, patch) pair per frame; None for keyframes and for frames
+        #identical to the one before
+        self.patches = []
+        self.frameCount = 0
+        self.isIndexed = False
+        self.error = None
+
+        self.cache = OrderedDict()
+        self.photos = OrderedDict()
+        self.playhead = 0
+        self.lock = threading.Lock()
+        self.wake = threading.Condition(self.lock)
+        self.stopped = False
+
+        with Image.open(filename) as image:
+            image.seek(0)
+            self.firstFrame = image.convert("RGB")
+
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    '''
+    Background thread body; indexes the whole file once, then keeps the cache
+    filled ahead of the playhead until close() is called
+    ################################################################################
+    '''
+    def work(self):
+        try:
+            self.buildIndex()
+        except Exception as e:
+            self.error = e
+            with self.lock:
+                self.isIndexed = True
+            return
+
+        while True:
+            with self.lock:
+                while not self.stopped and self.isPrefetched():
+                    self.wake.wait()
+                if self.stopped:
+                    return
+                wanted = [index for index in self.prefetchRange() if index not in self.cache]
+            for index in wanted:
+                if self.stopped:
+                    return
+                self.getImage(index)
+
+    '''
+    Single sequential pass over the file, recording keyframes and the changed
+    box of every other frame; frames become available to getImage() as soon
+    as they are indexed
+    ################################################################################
+    '''
+    def buildIndex(self):
+        with Image.open(self.filename) as image:
+            previous = None
+            index = 0
+            while not self.stopped:
+                try:
+                    image.seek(index)
+                except EOFError:
+                    break
+                frame = image.convert("RGB")
+                if index % self.keyframeInterval == 0:
+                    patch = None
+                    keyframe = zlib.compress(frame.tobytes(), 1)
+                else:
+                    box = ImageChops.difference(frame, previous).getbbox()
+                    patch = None if box is None else (box, frame.crop(box))
+                    keyframe = None
+                with self.lock:
+                    if keyframe is not None:
+                        self.keyframes.append(keyframe)
+                    self.patches.append(patch)
+                    self.mode = frame.mode
+                    self.size = frame.size
+                    self.frameCount = index + 1
+                    self.wake.notify_all()
+                previous = frame
+                index += 1
+        with self.lock:
+            self.isIndexed = True
+            self.wake.notify_all()
+
+    '''
+    Returns the frame numbers the worker should have cached for the current
+    playhead (the caller holds the lock)
+    ################################################################################
+    '''
+    def prefetchRange(self):
+        stop = min(self.playhead + self.prefetch + 1, self.frameCount)
+        return range(self.playhead, stop)
+
+    '''
+    Checks whether every frame in prefetchRange() is cached (the caller holds
+    the lock)
+    ################################################################################
+    '''
+    def isPrefetched(self):
+        return all(index in self.cache for index in self.prefetchRange())
+
+    '''
+    Tells the worker where playback is, so it can rebuild the frames after it
+    ################################################################################
+    index -> Frame currently on screen
+    ################################################################################
+    '''
+    def setPlayhead(self, index):
+        with self.lock:
+            self.playhead = index
+            self.wake.notify_all()
+
+    '''
+    Rebuilds one frame from the index, starting from the closest cached frame
+    or keyframe before it
+    ################################################################################
+    index -> Frame number
+    ################################################################################
+    Return image -> RGB PIL image of the frame, or None if that frame hasn't
+        been indexed yet
+    '''
+    def getImage(self, index):
+        with self.lock:
+            if index in self.cache:
+                self.cache.move_to_end(index)
+                return self.cache[index]
+            if index >= self.frameCount or index < 0:
+                return None
+            keyIndex = index - index % self.keyframeInterval
+            start = keyIndex
+            base = None
+            for cached in range(index - 1, keyIndex - 1, -1):
+                if cached in self.cache:
+                    start = cached
+                    base = self.cache[cached]
+                    break
+            if base is None:
+                keyframe = self.keyframes[keyIndex//self.keyframeInterval]
+            patches = self.patches[start + 1:index + 1]
+
+        if base is None:
+            image = Image.frombytes(self.mode, self.size, zlib.decompress(keyframe))
+        else:
+            image = base.copy()
+        for patch in patches:
+            if patch is not None:
+                image.paste(patch[1], patch[0])
+
+        with self.lock:
+            self.cache[index] = image
+            self.cache.move_to_end(index)
+            while len(self.cache) > self.cacheSize:
+                self.cache.popitem(last=False)
+        return image
+
+    '''
+    Returns a frame as a Tk image, for display; must be called from the Tk
+    thread, since that's where Tk images have to be made
+    ################################################################################
+    index -> Frame number
+    ################################################################################
+    Return photo -> ImageTk.PhotoImage of the frame, or None if that frame
+        hasn't been indexed yet
+    '''
+    def getPhoto(self, index):
+        if index in self.photos:
+            self.photos.move_to_end(index)
+            return self.photos[index]
+        image = self.firstFrame if index == 0 else self.getImage(index)
+        if image is None:
+            return None
+        photo = ImageTk.PhotoImage(image)
+        self.photos[index] = photo
+        while len(self.photos) > self.photoCacheSize:
+            self.photos.popitem(last=False)
+        return photo
+
+    '''
+    Stops the worker thread and drops every cached frame
+    ################################################################################
+    '''
+    def close(self):
+        with self.lock:
+            self.stopped = True
+            self.wake.notify_all()
+        self.worker.join()
+        self.cache.clear()
+        self.photos.clear()
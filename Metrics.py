@@ -0,0 +1,220 @@
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+################################################################################
+# Per-run instrumentation. A RunMetrics is handed to a Simulator (and so to its
+# plotting and animation code) and to the run stages in Runner.executeRun(); at
+# the end of the run record() gives one JSON-able dict:
+#
+#   "name"     -> Run name
+#   "started"  -> When the RunMetrics was made, as an ISO timestamp
+#   "wall"     -> Seconds from then until record() was called
+#   "stages"   -> stage name -> {"wall", "cpu", "calls"}, in the order they
+#                 first began.
+#                 CPU time is that of the thread the stage ran on. Run stages
+#                 ("simulate", "compPlot", "paramPlot", "anim", "finish") hold
+#                 the Simulator's own ("integrate", "write", "convert", "plot",
+#                 "render", "encode"), so the two sets overlap.
+#   "counters" -> e.g. "rhsEvaluations", "steps", "jacobianEvaluations",
+#                 "rejectedSteps", "cacheHits", "bytesWritten" (how much the
+#                 output files grew by), "framesRendered".
+#                 A counter the integrator can't supply is null rather than 0
+#                 (neither odeint nor LSODA through solve_ivp report rejected
+#                 steps, and solve_ivp doesn't report LSODA's step count).
+#   "peakRssBytes" -> Peak resident memory of the process (null where the
+#                 resource module isn't available, e.g. on Windows)
+#
+# writeRecord() appends a record as one line to a JSON lines file.
+################################################################################
+
+
+'''
+Peak resident memory of this process so far
+################################################################################
+Return bytes -> Peak RSS in bytes, or None if it can't be measured here
+'''
+def peakRssBytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak*1024
+
+
+'''
+Size of a file, or 0 if it doesn't exist
+################################################################################
+'''
+def fileBytes(filename):
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+'''
+Context manager timing a stage into metrics, or doing nothing if there are none
+################################################################################
+metrics -> RunMetrics, or None
+name -> Stage name
+################################################################################
+'''
+def timedStage(metrics, name):
+    if metrics is None:
+        return nullcontext()
+    return metrics.stage(name)
+
+
+class RunMetrics():
+
+    '''
+    Starts collecting metrics for a run
+    ################################################################################
+    name -> Run name, for the record
+    ################################################################################
+    '''
+    def __init__(self, name=None):
+        self.name = name
+        self.started = datetime.datetime.now()
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        #Stages may run on a background thread (e.g. a Pipeline's data write)
+        self.lock = threading.Lock()
+
+    '''
+    Times the code in a with block as one pass through a stage; passes through
+    the same stage add up
+    ################################################################################
+    name -> Stage name
+    ################################################################################
+    '''
+    @contextmanager
+    def stage(self, name):
+        #List the stage from when it starts, so stages stay in the order they
+        #began (outer before inner)
+        with self.lock:
+            self.stages.setdefault(name, {"wall":0.0, "cpu":0.0, "calls":0})
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield self
+        finally:
+            self.addTime(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    '''
+    Adds a pass through a stage that was timed elsewhere
+    ################################################################################
+    name -> Stage name
+    wall, cpu -> Seconds of wall and CPU time it took
+    ################################################################################
+    '''
+    def addTime(self, name, wall, cpu):
+        with self.lock:
+            stage = self.stages.setdefault(name, {"wall":0.0, "cpu":0.0, "calls":0})
+            stage["wall"] += wall
+            stage["cpu"] += cpu
+            stage["calls"] += 1
+
+    '''
+    Adds to a counter
+    ################################################################################
+    name -> Counter name
+    amount -> Amount to add; None records the counter as unavailable (null),
+        unless a value has already been counted for it
+    ################################################################################
+    '''
+    def count(self, name, amount=1):
+        with self.lock:
+            if amount is None:
+                self.counters.setdefault(name, None)
+            else:
+                self.counters[name] = (self.counters.get(name) or 0) + int(amount)
+
+    '''
+    Counts the work done by one integration
+    ################################################################################
+    rhsEvaluations, steps, jacobianEvaluations, rejectedSteps -> Counts reported
+        by the integrator, None for any it doesn't report
+    ################################################################################
+    '''
+    def countIntegration(self, rhsEvaluations, steps, jacobianEvaluations=None,
+        rejectedSteps=None):
+        self.count("integrations")
+        self.count("rhsEvaluations", rhsEvaluations)
+        self.count("steps", steps)
+        self.count("jacobianEvaluations", jacobianEvaluations)
+        self.count("rejectedSteps", rejectedSteps)
+
+    '''
+    Everything collected so far, as a JSON-able dict (see the top of this file)
+    ################################################################################
+    '''
+    def record(self):
+        with self.lock:
+            return {
+                "name":self.name,
+                "started":self.started.isoformat(timespec="seconds"),
+                "wall":time.perf_counter() - self.start,
+                "stages":{name:dict(stage) for name, stage in self.stages.items()},
+                "counters":dict(self.counters),
+                "peakRssBytes":peakRssBytes()
+            }
+
+
+'''
+Appends a record to a JSON lines file
+################################################################################
+filename -> File to append to (created if needed)
+record -> dict from RunMetrics.record()
+################################################################################
+Return True -> Returns true if the record was written
+'''
+def writeRecord(filename, record):
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filename, 'a') as file:
+        file.write(json.dumps(record) + "\n")
+    return True
+
+
+'''
+Reads every record back from a JSON lines file
+################################################################################
+filename -> File written by writeRecord()
+################################################################################
+Return records -> List of dicts, in the order they were written
+'''
+def readRecords(filename):
+    with open(filename, 'r') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+'''
+Short multi-line summary of a record, e.g. for a progress dialog
+################################################################################
+record -> dict from RunMetrics.record()
+################################################################################
+Return text -> One line for the run as a whole, one per stage, and one for the
+    counters
+'''
+def formatRecord(record):
+    lines = ["Total %.2f s" % record["wall"]]
+    if record["peakRssBytes"] is not None:
+        lines[0] += ", peak memory %.0f MB" % (record["peakRssBytes"]/2**20)
+    for name, stage in record["stages"].items():
+        lines.append("%s: %.2f s (CPU %.2f s)" % (name, stage["wall"], stage["cpu"]))
+    counters = []
+    for name, value in record["counters"].items():
+        counters.append(name + " " + ("n/a" if value is None else str(value)))
+    if counters:
+        lines.append(", ".join(counters))
+    return "\n".join(lines)
@@ -0,0 +1,108 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from Solver import Simulator
+
+################################################################################
+# Keeps a solution in memory between the stages of a run (solve, save, plot,
+# animate), in the same [names, fullArray] form readSolData() returns, so the
+# plotting stages never have to wait on a write and re-read of the data file.
+# The data file is only written when asked for, on a background thread, while
+# the plots and animation are being made.
+################################################################################
+
+DEFAULT_FIELD_NAMES = ["tau","r","phi","dt/dtau","dr/dtau","dphi/dtau"]
+
+
+class Pipeline():
+
+    '''
+    Sets up an empty pipeline
+    ################################################################################
+    sim -> Simulator to solve, plot and write with (a new one by default)
+    fieldNames -> Names of the independent variable and each solution column
+    ################################################################################
+    '''
+    def __init__(self, sim=None, fieldNames=DEFAULT_FIELD_NAMES):
+        self.sim = Simulator() if sim is None else sim
+        self.fieldNames = list(fieldNames)
+        self.solData = None
+        self.metadata = None
+        self.writer = None
+        self.pendingWrites = []
+
+    '''
+    Solves a run and keeps the result in memory
+    ################################################################################
+    initConditions, indVals, derivatives, stopConditions, solverOptions,
+        progress -> As for Simulator.writeSolData()
+    ################################################################################
+    Return solData -> [names, fullArray], exactly what readSolData() would give
+        back for a CSV file written from the same run
+    '''
+    def simulate(self, initConditions, indVals, derivatives=None,
+        stopConditions=None, solverOptions={}, progress=None):
+        if derivatives is None:
+            derivatives = self.sim.Schwarzschild
+        rVals, self.metadata = self.sim.solveSolData(initConditions, indVals,
+            derivatives, stopConditions=stopConditions, solverOptions=solverOptions,
+            progress=progress)
+        steps = rVals.shape[0]
+        fullArray = np.empty((steps, rVals.shape[1] + 1))
+        fullArray[:, 0] = np.asarray(indVals, dtype=float)[:steps]
+        fullArray[:, 1:] = rVals
+        self.solData = [self.fieldNames[:fullArray.shape[1]], fullArray]
+        return self.solData
+
+    '''
+    Writes the solution to a data file (CSV or .trj, by extension)
+    ################################################################################
+    filename -> File to write to
+    background -> If True, write on a background thread and return at once;
+        finish() waits for the write and reports any error from it
+    precision -> Significant digits per value, see Simulator.writeSolArray()
+    ################################################################################
+    Return True -> Returns true if writing was successful (or has started)
+    '''
+    def saveData(self, filename, background=False, precision=None):
+        names, fullArray = self.solData
+        args = (filename, fullArray[:, 0], fullArray[:, 1:], names)
+        options = {"precision":precision, "metadata":self.metadata}
+        if not background:
+            return self.sim.writeSolArray(*args, **options)
+        if self.writer is None:
+            self.writer = ThreadPoolExecutor(max_workers=1)
+        self.pendingWrites.append(self.writer.submit(self.sim.writeSolArray,
+            *args, **options))
+        return True
+
+    '''
+    Makes a component or parametric plot of the solution; takes the same
+    arguments as Simulator.plotSolData(), minus allData
+    ################################################################################
+    '''
+    def plot(self, shouldParameterize, shouldShow, shouldSave, **kwargs):
+        return self.sim.plotSolData(self.solData, shouldParameterize, shouldShow,
+            shouldSave, **kwargs)
+
+    '''
+    Animates the solution; takes the same arguments as
+    Simulator.makeAnimation(), minus allData
+    ################################################################################
+    '''
+    def animate(self, shouldShow, shouldSave, **kwargs):
+        return self.sim.makeAnimation(self.solData, shouldShow, shouldSave, **kwargs)
+
+    '''
+    Waits for any background writes to complete, re-raising the first error
+    ################################################################################
+    Return True -> Returns true once everything has been written
+    '''
+    def finish(self):
+        pending = self.pendingWrites
+        self.pendingWrites = []
+        for write in pending:
+            write.result()
+        if self.writer is not None:
+            self.writer.shutdown()
+            self.writer = None
+        return True
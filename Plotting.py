@@ -0,0 +1,288 @@
+import time
+import matplotlib.pyplot as plt
+import matplotlib.patches as pch
+from Conversions import selectColumns
+from Animation import (RENDERERS, animationBounds, countFrames, frameDelay,
+    planFrames, renderFrames, renderFramesParallel, saveFrames, timeFrames)
+from Metrics import fileBytes, timedStage
+
+################################################################################
+# Plots and animations of solutions. Kept apart from Solver so the integration
+# code can be imported (e.g. by sweep and batch workers) without loading
+# matplotlib or Pillow; Simulator.plotSolData() and Simulator.makeAnimation()
+# import this module the first time they are called.
+################################################################################
+
+
+'''
+Main plotting method that creates, saves, and displays plots of provided data
+***Restricted to 2D plots at the moment***
+################################################################################
+allData -> A list containing at index [0] the names of each data field, and at
+    index [1] a 2D Array of all associated values of those "timesteps" data
+    fields; rows = values for each timestep, columns = values for each field
+    therein
+shouldParameterize -> Should we make a parametric plot, or plot each field
+    separately?
+shouldShow -> Should we immediately display the created plots?
+shouldSave -> Should we save the created plots?
+filename -> If shouldSave is True, then the created plots will go here.
+plotTitle -> Title of the plot to be created
+timeUnits -> Units for the x or "timestep" axis if shouldParameterize is False
+labels -> List of value-field axis labels, defaults to basic alphabetical
+yUnits -> List of corresponding units for those labels, defaults to "meters"
+paramUnits -> List of axis units to use for a parameterized plot
+dataNames -> List of header names that the conversion will use to map data;
+    identifies the appropriate column in fullArray
+conversion -> If shouldParameterize is True, this is the mapping between the R^N
+    "time" and value fields and the R^2 x, y Cartesian coordinates we'll plot
+    with; like the ODE equations is a method defined somewhere else, passed
+    "by reference." Defaults to truncation of 2+N value fields, passing the
+    first two non-timestep fields as x and y directly.
+showEH -> Draw the event horizon on parametric plots
+metrics -> Optional RunMetrics to record the conversion and bytes saved into
+################################################################################
+Return True -> Returns true if the plotting, saving, and/or displaying succeeded
+'''
+def plotSolData(allData, shouldParameterize, shouldShow, shouldSave,
+ filename = "defaultFilename.png",
+ plotTitle = "Output",
+ timeUnits="seconds",
+ labels=[chr(i) for i in range(97,123,1)],
+ yUnits=[None],
+ paramUnits = ["meters", "meters"],
+ dataNames=["x", "y"],
+ conversion=selectColumns,
+ showEH=True,
+ metrics=None):
+
+    names = allData[0]
+    fullArray = allData[1]
+
+    #Grab the timesteps into their own array for convenient access later
+    tSteps = fullArray[:, 0]
+
+    #If we should make a parametric plot
+    if shouldParameterize:
+
+        fig, ax = plt.subplots(figsize=(5,5))
+        ax.set_aspect(1)
+
+        #Find the column location in fullArray of the data we want to use
+        locs = [names.index(name) for name in dataNames]
+        #Get the x and y arrays using our specified conversion by passing
+        #the "coordinate" value fields into it, effectively transforming our
+        #data into a path in Cartesian coordinates
+        with timedStage(metrics, "convert"):
+            out = conversion(fullArray[:, :], locs)
+        x = out[:, 0]
+        y = out[:, 1]
+        #Title the plot
+        ax.set_title(plotTitle)
+        #Label the x and y axes "x (units)", "y (units)"
+        ax.set_xlabel("x (" + paramUnits[0] + ")")
+        ax.set_ylabel("y (" + paramUnits[1] + ")")
+        #Plot the x values versus the y values, which will implicitly be parametric
+        ax.plot(x, y)
+
+        if showEH:
+            circle = pch.Circle((0,0),radius=2,color='black')
+            ax.add_patch(circle)
+
+            """
+            #me overthinking things
+            try:
+                circledata = self.readSolData("EHcircle.dat")
+            except:
+                self.ehcircle()
+                circledata = self.readSolData("EHcircle.dat")
+            circleArray = circledata[1]
+            circleout = self.paramConversion(circleArray[:,:],[1,2])
+            xc = circleout[:,0]
+            yc = circleout[:,1]
+            plt.plot(xc,yc)
+            """
+    #If we're not making parametric plots
+    else:
+        #Get the size of the "coordinate" fields in the input array
+        n = fullArray.shape[1] - 1
+        #Title the overall plot
+        
+        fig = plt.figure(figsize=(6,8))
+        #Generate default unit labels for each axis if none were given
+        if yUnits[0] == None:
+            yUnits = ["meters" for i in range(n)]
+        #For each coordinate field, we will make additional subplots which will
+        #automatically be composited into a single larger one for ease of
+        #saving and display
+        for axis in range(1,n+1):
+            #Make a new subplot in the (n, 1) grid (e.g., successive axes will
+            #move downwards)
+            ax = fig.add_subplot(n, 1, axis)
+            #Label the x-axis as time
+            ax.set_xlabel(u'\u03C4' +  " (" + timeUnits + ")")
+            #and the y-axis as whatever the name of the coordinate is
+            if yUnits[axis] != "":
+                ax.set_ylabel(labels[axis] + " (" + yUnits[axis] + ")")
+            else:
+                ax.set_ylabel(labels[axis])
+            #Then plot it with x using the timestep data and y using the
+            #coordinate data for that axis
+            ax.plot(tSteps, fullArray[:, axis])
+            #set a title, but only for the first plot; hacky, but w/e
+            if axis == 1:    
+                ax.set_title(plotTitle)
+            
+        #Space out axes at the end so the x-labels don't overlap with the graph below
+        fig.subplots_adjust(hspace=1)
+        
+    #If we should save the plot, write the resulting plot to the given filename
+    if shouldSave:
+        plt.savefig(filename)
+        if metrics is not None:
+            metrics.count("bytesWritten", fileBytes(filename))
+    #If we should show the plot, display it
+    if shouldShow:
+        plt.show()
+    else:
+        #Otherwise nothing would ever close it, and a process making many plots
+        #(e.g. a batch worker) would keep every one of them open
+        plt.close(fig)
+
+    #Return True if plot generation was successful
+    return True
+
+
+'''
+Animates the parametric path of the provided data as it is traced out
+################################################################################
+allData -> [names, fullArray] as for plotSolData()
+shouldShow -> Should we immediately display the animation?
+shouldSave -> Should we save the animation?
+dataNames, conversion, paramUnits -> As for plotSolData()
+filename -> If shouldSave is True, then the animation will go here; the
+    extension picks the format (.gif, .png/.apng or .webp). Every frame is
+    held in memory until the file is written (see Animation.saveFrames())
+animTitle -> Title of the animation
+boundScale -> Factor the extremes of the path are scaled by to frame it
+animSpeed -> Unused, kept for existing callers
+frameSlice -> Legacy frame budget of one frame per frameSlice points, used
+    when frameCount is not given
+frameCount -> Exact number of distinct frames to produce
+duration -> Target play time of the saved animation in seconds
+fps -> Target frame rate of the saved animation, if duration isn't given
+workers -> Number of processes to render frames with; 1 renders in this
+    process
+backend -> "matplotlib" to draw every frame with matplotlib, or "pillow" to
+    only lay out the background with matplotlib and draw the path with the
+    much cheaper Pillow rasterizer
+progress -> Optional callback, passed the fraction of frames written so far
+metrics -> Optional RunMetrics to record the conversion, frame rendering,
+    encoding, frames rendered and bytes saved into
+################################################################################
+Return True -> Returns true if the animation was made successfully
+'''
+def makeAnimation(
+    allData,
+    shouldShow,
+    shouldSave,
+    dataNames=["x", "y"],
+    conversion=selectColumns,
+    paramUnits = ["meters", "meters"],
+    filename = 'defaultFilename.gif',
+    animTitle = "Output",
+    boundScale = 1.3,
+    animSpeed = 1,
+    frameSlice = 10,
+    frameCount = None,
+    duration = None,
+    fps = None,
+    workers = 1,
+    backend = "matplotlib",
+    progress = None,
+    metrics = None
+    ):
+
+    names = allData[0]
+    fullArray = allData[1]
+
+    locs = [names.index(name) for name in dataNames]
+    with timedStage(metrics, "convert"):
+        out = conversion(fullArray[:, :], locs)
+
+    x = out[:, 0].flatten()
+    y = out[:, 1].flatten()
+
+    #Each frame ends at one of these indices, so every frame is distinct
+    ends = planFrames(len(x), frameCount, frameSlice)
+
+    if shouldSave:
+        #Only the new segment is drawn for each frame, on top of the last,
+        #and every frame is mapped onto one shared palette
+        rendererOptions = {"paramUnits":paramUnits, "boundScale":boundScale}
+        renderer = RENDERERS[backend](x, y, **rendererOptions)
+        palette = renderer.makePalette()
+        if workers > 1:
+            frames = renderFramesParallel(x, y, ends, backend, rendererOptions,
+                palette, workers)
+        else:
+            frames = renderFrames(renderer, ends, palette)
+        if metrics is not None:
+            #Frames are rendered as the writer asks for them, so the time spent
+            #waiting on each one is rendering and the rest of the save encoding
+            rendering = [0.0, 0.0, 0]
+            frames = timeFrames(frames, rendering)
+            wall = time.perf_counter()
+            cpu = time.thread_time()
+        if progress is not None:
+            frames = countFrames(frames, len(ends), progress)
+        saveFrames(filename, frames, frameDelay(len(ends), duration, fps))
+        if metrics is not None:
+            metrics.addTime("render", rendering[0], rendering[1])
+            metrics.addTime("encode", time.perf_counter() - wall - rendering[0],
+                time.thread_time() - cpu - rendering[1])
+            metrics.count("framesRendered", rendering[2])
+            metrics.count("bytesWritten", fileBytes(filename))
+
+    if shouldShow:
+        fig, ax = plt.subplots(figsize=(5, 5))
+        ax.set_aspect(1)
+        ax.set_xlabel("x" + "(" + paramUnits[0]  + ")")
+        ax.set_ylabel("y" + "(" + paramUnits[1] +  ")")
+        xMin, xMax, yMin, yMax = animationBounds(x, y, boundScale)
+        ax.set(xlim=(xMin, xMax), ylim=(yMin, yMax))
+        circle = pch.Circle((0,0),radius=2,color='black')
+        ax.add_patch(circle)
+        #As when saving, only the new segment is drawn for each frame, blitted
+        #on top of what is already on screen. The line is animated so full
+        #redraws leave it out; after one (e.g. a resize) the path so far is put
+        #back in a single draw
+        line = ax.plot(x[:1], y[:1], color='b', lw=2, animated=True)[0]
+        drawnTo = [1]
+        nextFrame = [0]
+
+        def drawSegment(begin, end):
+            line.set_data(x[begin:end], y[begin:end])
+            ax.draw_artist(line)
+            return end
+
+        def redrawPath(event):
+            drawSegment(0, drawnTo[0])
+
+        def showFrame():
+            if nextFrame[0] >= len(ends):
+                timer.stop()
+                return
+            drawnTo[0] = drawSegment(drawnTo[0] - 1, ends[nextFrame[0]])
+            nextFrame[0] += 1
+            fig.canvas.blit(ax.bbox)
+
+        fig.canvas.mpl_connect("draw_event", redrawPath)
+        timer = fig.canvas.new_timer(interval=frameDelay(len(ends), duration, fps))
+        timer.add_callback(showFrame)
+        timer.start()
+        plt.show()
+
+    print("Animation Complete")
+
+    return True
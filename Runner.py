@@ -0,0 +1,381 @@
+import multiprocessing
+import os
+import queue
+import signal
+import traceback
+from collections import deque
+
+################################################################################
+# Runs simulations for the GUI in a separate process, so the Tk main loop stays
+# responsive. A run is described by a plain dict (a "job", see executeRun()),
+# and reports back over a queue:
+#   ("progress", fraction, label) -> fraction of the whole run done so far
+#   ("done", result)              -> finished; result is the dict of outputs
+#   ("error", message)            -> failed with the given traceback
+# Runs are processes rather than threads so that cancelling one can stop it
+# in the middle of an integration, and so matplotlib never runs off the main
+# thread of the process using it. Run processes aren't daemons, since a run may
+# render its animation on a pool of processes of its own; cancelling a run (or
+# closing the GUI) stops the pool with it.
+################################################################################
+
+#Relative cost of each stage of a run, used to turn per-stage progress into a
+#single fraction for the whole run
+STAGE_WEIGHTS = {
+    "simulate":6,
+    "compPlot":1,
+    "paramPlot":1,
+    "anim":4
+}
+
+#Fresh interpreters for every run, rather than forked copies of the GUI's
+SPAWN_CONTEXT = multiprocessing.get_context("spawn")
+
+
+'''
+Picks the stop conditions for a run from the kind of orbit it launches: plunging
+runs end at the horizon instead of integrating into the coordinate singularity,
+and scattering runs once they are well clear of where they started. Other orbits
+need no events, and are left to the faster odeint() path
+################################################################################
+sim -> Simulator to classify with
+initialConditions -> [r, phi, dt/dtau, dr/dtau, dphi/dtau]
+################################################################################
+Return stopConditions -> dict for Simulator.getSolDataEvents(), or None to solve
+    without events
+'''
+def runStopConditions(sim, initialConditions):
+    from Solver import ORBIT_PLUNGE, ORBIT_SCATTER
+
+    r_0, p_0, a_0, v_0, w_0 = initialConditions
+    orbitInfo = sim.classifyOrbit(
+        (1-2/r_0)*a_0,
+        (r_0**2)*w_0,
+        r_0,
+        v_0 > 0
+        )
+    if orbitInfo["class"] == ORBIT_PLUNGE:
+        return {}
+    if orbitInfo["class"] == ORBIT_SCATTER:
+        return {"escapeRadius":2*r_0}
+    return None
+
+
+'''
+Carries out one run: integrates the orbit, writes the data file and makes the
+requested plots and animation, reporting progress as it goes
+################################################################################
+job -> dict describing the run, with keys
+    "name" -> Run name, used as the plot titles
+    "initialConditions" -> [r, phi, dt/dtau, dr/dtau, dphi/dtau]
+    "tSteps" -> Proper time span to integrate over
+    "deltaTime" -> Proper time between output rows
+    "stopConditions" -> Passed on to Simulator.writeSolData()
+    "paths" -> dict of output paths for "data", "compPlot", "paramPlot" and
+        "anim"
+    "outputs" -> dict of booleans saying which of those to write
+    "cacheDir" -> Optional directory of a ResultCache to reuse solutions from
+    "driftBudget" -> Optional; if given, the loosest integrator tolerances that
+        keep the conserved quantities within this drift are found first (see
+        Simulator.tuneTolerances()) and used for the run
+    "animBackend" -> Optional renderer for the animation, "matplotlib" (the
+        default) or "pillow" (see Plotting.makeAnimation())
+    "animWorkers" -> Optional number of processes to render the animation's
+        frames with (default 1, in the run's own process)
+report -> Callback taking (fraction, label)
+################################################################################
+Return result -> dict of the output paths actually written, plus the run's
+    "metrics" record (see Metrics.py), its conservation "drift" (see
+    Simulator.conservationDrift()) and, with a drift budget, the "tuning" that
+    picked its tolerances
+'''
+def executeRun(job, report):
+    import numpy as np
+    from Cache import ResultCache
+    from Metrics import RunMetrics
+    from Pipeline import Pipeline
+    from Solver import Simulator
+
+    metrics = RunMetrics(job["name"])
+    cache = None
+    if job.get("cacheDir") is not None:
+        cache = ResultCache(job["cacheDir"])
+    pipeline = Pipeline(Simulator(cache=cache, metrics=metrics))
+    paths = job["paths"]
+    outputs = job["outputs"]
+
+    stages = ["simulate"] + [key for key in ["compPlot", "paramPlot", "anim"] if outputs[key]]
+    total = float(sum(STAGE_WEIGHTS[stage] for stage in stages))
+    starts = {}
+    done = 0
+    for stage in stages:
+        starts[stage] = done/total
+        done += STAGE_WEIGHTS[stage]
+
+    def stageReporter(stage, label):
+        def stageProgress(fraction):
+            report(starts[stage] + fraction*STAGE_WEIGHTS[stage]/total, label)
+        return stageProgress
+
+    tSteps = job["tSteps"]
+    indVals = np.linspace(0, tSteps, int(tSteps/job["deltaTime"]))
+    result = {}
+
+    solverOptions = {}
+    if job.get("driftBudget") is not None:
+        report(0, "Tuning tolerances...")
+        with metrics.stage("tune"):
+            tuning = pipeline.sim.tuneTolerances(job["initialConditions"], indVals,
+                job["driftBudget"], stopConditions=job["stopConditions"])
+        solverOptions = {"rtol":tuning["rtol"], "atol":tuning["atol"]}
+        result["tuning"] = tuning
+
+    report(0, "Simulating...")
+    with metrics.stage("simulate"):
+        names, fullArray = pipeline.simulate(
+            job["initialConditions"],
+            indVals,
+            stopConditions=job["stopConditions"],
+            solverOptions=solverOptions,
+            progress=stageReporter("simulate", "Simulating...")
+            )
+    result["drift"] = pipeline.sim.conservationDrift(fullArray[:, 1:])
+
+    #The plots and animation work from the solution in memory, so the data
+    #file (if wanted) is written alongside them
+    if outputs["data"]:
+        pipeline.saveData(paths["data"], background=True)
+        result["data"] = paths["data"]
+
+    tauUCode = u'\u03C4'
+    phiUCode = u'\u03D5'
+    dphi_dt_String = "d" + phiUCode + "/" "d" + tauUCode
+
+    fNF = [
+        tauUCode,
+        'r',
+        phiUCode,
+        "dt/d" + tauUCode,
+        "dr/d " + tauUCode,
+        dphi_dt_String
+        ]
+
+    if outputs["compPlot"]:
+        report(starts["compPlot"], "Generating Plots...")
+        with metrics.stage("compPlot"):
+            pipeline.plot(
+                False,
+                False,
+                True,
+                filename=paths["compPlot"],
+                plotTitle=job["name"],
+                timeUnits="M",
+                labels=fNF,
+                yUnits=['M', 'M', "rad", "", "", "rad/M"]
+            )
+        result["compPlot"] = paths["compPlot"]
+
+    if outputs["paramPlot"]:
+        report(starts["paramPlot"], "Generating Plots...")
+        with metrics.stage("paramPlot"):
+            pipeline.plot(
+                True,
+                False,
+                True,
+                filename=paths["paramPlot"],
+                plotTitle=job["name"],
+                paramUnits=["M", "M"],
+                dataNames=["r", "phi"],
+                conversion=pipeline.sim.paramConversion
+            )
+        result["paramPlot"] = paths["paramPlot"]
+
+    if outputs["anim"]:
+        report(starts["anim"], "Animating...")
+        with metrics.stage("anim"):
+            pipeline.animate(
+                False,
+                True,
+                filename=paths["anim"],
+                animTitle=job["name"],
+                dataNames=["r", "phi"],
+                paramUnits=["M","M"],
+                conversion=pipeline.sim.paramConversion,
+                frameSlice=int(np.ceil((tSteps/job["deltaTime"])/500)),
+                workers=job.get("animWorkers", 1),
+                backend=job.get("animBackend", "matplotlib"),
+                progress=stageReporter("anim", "Animating...")
+            )
+        result["anim"] = paths["anim"]
+
+    #Waits for the data file, if it is still being written
+    with metrics.stage("finish"):
+        pipeline.finish()
+    result["metrics"] = metrics.record()
+    report(1, "Done")
+    return result
+
+
+'''
+Entry point of a run's process; runs the job and posts the outcome to the queue
+################################################################################
+job -> dict describing the run, see executeRun()
+messages -> Queue to report over
+################################################################################
+'''
+def runWorker(job, messages):
+    #Lead a process group of our own, so stopProcess() can take any frame
+    #rendering pool down along with us
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    #No windows from this process; everything is drawn straight to file
+    import matplotlib
+    matplotlib.use("Agg")
+    try:
+        result = executeRun(job,
+            lambda fraction, label: messages.put(("progress", fraction, label)))
+    except Exception:
+        messages.put(("error", traceback.format_exc()))
+        return
+    messages.put(("done", result))
+
+
+'''
+Stops a run's process and waits for it, along with any processes it started
+(e.g. the pool rendering its animation frames), which would otherwise outlive it
+################################################################################
+process -> Process running runWorker()
+################################################################################
+'''
+def stopProcess(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (AttributeError, OSError):
+        #No process groups here (Windows), or the run hasn't set its up yet
+        process.terminate()
+    process.join()
+
+
+class RunQueue():
+
+    '''
+    Queue of runs, executed one at a time in their own process
+    ################################################################################
+    onProgress -> Called with (job, fraction, label) as a run progresses
+    onFinished -> Called with (job, status, payload) once a run ends; status is
+        "done" (payload is the result dict), "error" (payload is the traceback)
+        or "cancelled" (payload is None)
+    ################################################################################
+    '''
+    def __init__(self, onProgress=None, onFinished=None):
+        self.onProgress = onProgress
+        self.onFinished = onFinished
+        self.pending = deque()
+        self.current = None
+        self.process = None
+        self.messages = None
+        self.nextId = 0
+
+    '''
+    Adds a run to the back of the queue, starting it straight away if nothing
+    else is running
+    ################################################################################
+    job -> dict describing the run, see executeRun(); its "runId" is set here
+    ################################################################################
+    Return runId -> Identifier of the run, for cancel()
+    '''
+    def submit(self, job):
+        job["runId"] = self.nextId
+        self.nextId += 1
+        self.pending.append(job)
+        self.startNext()
+        return job["runId"]
+
+    '''
+    Starts the next queued run if none is running
+    ################################################################################
+    '''
+    def startNext(self):
+        if self.current is not None or not self.pending:
+            return
+        self.current = self.pending.popleft()
+        self.messages = SPAWN_CONTEXT.Queue()
+        self.process = SPAWN_CONTEXT.Process(target=runWorker,
+            args=(self.current, self.messages))
+        self.process.start()
+
+    '''
+    Cancels a run; the running one is stopped immediately, queued ones are just
+    dropped
+    ################################################################################
+    runId -> Run to cancel; None for the one currently running
+    ################################################################################
+    Return True -> Returns true if a run was cancelled
+    '''
+    def cancel(self, runId=None):
+        if self.current is not None and runId in (None, self.current["runId"]):
+            stopProcess(self.process)
+            self.finish("cancelled", None)
+            return True
+        for job in self.pending:
+            if job["runId"] == runId:
+                self.pending.remove(job)
+                if self.onFinished is not None:
+                    self.onFinished(job, "cancelled", None)
+                return True
+        return False
+
+    '''
+    Cancels the running run and everything queued behind it
+    ################################################################################
+    '''
+    def cancelAll(self):
+        while self.pending:
+            self.cancel(self.pending[-1]["runId"])
+        self.cancel()
+
+    '''
+    Hands any messages from the running run to the callbacks; call this
+    regularly from the thread the callbacks should run on (e.g. a Tk after()
+    loop)
+    ################################################################################
+    '''
+    def poll(self):
+        while self.current is not None:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                #A run that died without a word (e.g. killed) counts as failed
+                if not self.process.is_alive() and self.messages.empty():
+                    self.finish("error", "Run process exited with code " +
+                        str(self.process.exitcode))
+                return
+            if message[0] == "progress":
+                if self.onProgress is not None:
+                    self.onProgress(self.current, message[1], message[2])
+            else:
+                self.process.join()
+                self.finish(message[0], message[1])
+
+    '''
+    Wraps up the running run and moves on to the next one
+    ################################################################################
+    status -> "done", "error" or "cancelled"
+    payload -> Result dict, traceback or None, depending on status
+    ################################################################################
+    '''
+    def finish(self, status, payload):
+        job = self.current
+        self.current = None
+        self.process = None
+        self.messages = None
+        if self.onFinished is not None:
+            self.onFinished(job, status, payload)
+        self.startNext()
+
+    '''
+    Checks whether a run is in progress or waiting
+    ################################################################################
+    '''
+    def isBusy(self):
+        return self.current is not None or len(self.pending) > 0
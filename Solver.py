@@ -1,10 +1,32 @@
 import numpy as np
-from scipy.integrate import odeint
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from matplotlib.animation import ImageMagickWriter
-from matplotlib.collections import PatchCollection
-import matplotlib.patches as pch
+import os
+import time
+from scipy.integrate import odeint, solve_ivp
+from scipy.special import ellipj, ellipk
+from Cache import UncacheableError
+from Conversions import selectColumns, polarToCartesian
+from Metrics import fileBytes, timedStage
+from Trajectory import (TRAJECTORY_EXTENSION, appendTrajectory, isTrajectoryFile,
+    readTrajectory, readTrajectoryHeader, writeTrajectory)
+
+#Orbit classes, as reported by parameter sweeps
+ORBIT_BOUND = 0
+ORBIT_PLUNGE = 1
+ORBIT_SCATTER = 2
+ORBIT_FORBIDDEN = 3
+ORBIT_CLASS_NAMES = ["bound", "plunge", "scatter", "forbidden"]
+
+#Rows integrated per chunk by streamSolData()
+DEFAULT_STREAM_ROWS = 65536
+
+#odeint()'s default rtol and atol, which getSolDataEvents() matches
+DEFAULT_TOLERANCE = 1.49012e-8
+#Tolerances tuneTolerances() tries (as both rtol and atol), loosest first
+TOLERANCE_LADDER = [1e-4, 1e-5, 1e-6, 1e-7, 1e-8, 1e-9, 1e-10, 1e-11, 1e-12]
+#Size, as a fraction of (2m)**-6 (the scale of its terms), below which the
+#discriminant of the effective-potential cubic counts as zero, so that circular
+#orbits keep their double root through round-off
+CUBIC_TOLERANCE = 1e-10
 
 
 def dy_dx(y, x):
@@ -20,18 +42,70 @@ def dtheta_dt(t, theta):
     return 1/(2 * np.pi)
 
 '''
-Reads ODE solution data from a file
+Wraps a system of ODE's so that it reports how far through the integration the
+solver has got, judged from the independent variable values it is evaluated at
 ################################################################################
-filename -> File to read data from (file is not affected)
+derivatives -> ODE system in odeint()'s f(y, s, *args) form
+indVals -> Range of independent variable values being integrated over
+progress -> Callback taking the fraction of indVals covered so far (0 to 1)
+step -> Smallest increase in the fraction worth reporting
 ################################################################################
-Return dOut -> A 2D array of the file's contents, separated by field
+Return reporting -> Drop-in replacement for derivatives
 '''
+def reportProgress(derivatives, indVals, progress, step=0.01):
+    start = float(indVals[0])
+    span = float(indVals[-1]) - start
+    reached = [0.0]
+
+    def reporting(y, s, *args):
+        #Steps the solver rejects can go back in time; only ever report forwards
+        fraction = min((s - start)/span, 1.0) if span else 1.0
+        if fraction >= reached[0] + step:
+            reached[0] = fraction
+            progress(fraction)
+        return derivatives(y, s, *args)
+    return reporting
 
 class Simulator():
 
-    def __init__(self):
+    '''
+    cache -> Optional ResultCache (see Cache.py); when given, getSolData() and
+        getSolDataEvents() reuse earlier results for identical runs
+    metrics -> Optional RunMetrics (see Metrics.py) to record integrator work,
+        file writes, plotting and animation into
+    '''
+    def __init__(self, cache=None, metrics=None):
+        self.cache = cache
+        self.metrics = metrics
         return None
 
+    '''
+    Context manager timing a stage into self.metrics (if there are any)
+    ################################################################################
+    '''
+    def stage(self,name):
+        return timedStage(self.metrics, name)
+
+    '''
+    Runs odeint(), counting its right-hand side evaluations, steps and Jacobian
+    evaluations into self.metrics (if there are any)
+    ################################################################################
+    Arguments as for odeint()
+    ################################################################################
+    Return solution -> odeint()'s solution array
+    '''
+    def integrate(self,derivatives, initConditions, indVals, **kwargs):
+        if self.metrics is None:
+            return odeint(derivatives, initConditions, indVals, **kwargs)
+        with self.metrics.stage("integrate"):
+            solution, info = odeint(derivatives, initConditions, indVals,
+                full_output=True, **kwargs)
+        if len(info["nst"]):
+            #odeint doesn't report rejected steps
+            self.metrics.countIntegration(info["nfe"][-1], info["nst"][-1],
+                info["nje"][-1])
+        return solution
+
 ################################################################################
 # Schwarzschild Equations of Motion (1st order in tau; s=tau)
 ################################################################################
@@ -43,7 +117,7 @@ class Simulator():
         d3 = (-2*m/(r**2))*((1-(2*m/r))**(-1))*v*a # these equations compute the second derivatives of t, r and phi
         #if np.absolute(d3) <= 0.000000001: #rectification for error slip
         #    d3 = 0
-        d4 = (2*m/(r**2))*((1-(2*m/r))**-1)*(v**2)-(1-(2*m/r))*(m/(r**2))*(a**2)+r*(1-(2*m/r))*(w**2)
+        d4 = (m/(r**2))*((1-(2*m/r))**-1)*(v**2)-(1-(2*m/r))*(m/(r**2))*(a**2)+r*(1-(2*m/r))*(w**2)
         #if np.absolute(d4) <= 0.000000001:
         #    d4 = 0
         d5 = (-2/r)*v*w
@@ -54,6 +128,273 @@ class Simulator():
         dyds = [d1,d2,d3,d4,d5]
         return dyds
 
+    '''
+    Vectorized version of Schwarzschild() that advances many orbits at once
+    ################################################################################
+    y -> Flattened state of N orbits, stored orbit by orbit so that each orbit's
+        [r, phi, dt/dtau, dr/dtau, dphi/dtau] is contiguous (keeps the Jacobian
+        banded if odeint switches to its stiff method)
+    s -> Proper time; unused, but required by odeint's calling convention
+    m -> Mass of the central body
+    ################################################################################
+    Return dyds -> Flattened derivatives of all N orbits, same layout as y
+    '''
+    def SchwarzschildBatch(self,y,s,m=1):
+        #View the state as a (5, N) array, one row per variable; no copy is made
+        r, p, a, v, w = y.reshape((-1, 5)).T
+        dyds = np.empty((r.shape[0], 5))
+        sfactor = 1-(2*m/r)
+        dyds[:, 0] = v
+        dyds[:, 1] = w
+        dyds[:, 2] = (-2*m/(r**2))*v*a/sfactor
+        dyds[:, 3] = (m/(r**2))*(v**2)/sfactor-sfactor*(m/(r**2))*(a**2)+r*sfactor*(w**2)
+        dyds[:, 4] = (-2/r)*v*w
+        return dyds.ravel()
+
+    '''
+    Integrates N orbits together through the vectorized SchwarzschildBatch()
+    ################################################################################
+    initConds -> (N, 5) array of initial conditions, one row per orbit, each in
+        the same [r, phi, dt/dtau, dr/dtau, dphi/dtau] form initcondgen() returns
+    tau -> Range of proper time values shared by every orbit
+    m -> Mass of the central body
+    chunkSize -> Maximum number of orbits handed to a single odeint() call; the
+        step size of a call is set by its hardest orbit, so very large batches
+        are split up to keep one plunging orbit from slowing down the rest
+    ################################################################################
+    Return solution -> (N, T, 5) array holding each orbit's trajectory
+    '''
+    def solveBatch(self,initConds, tau, m=1, chunkSize=1024):
+        initConds = np.atleast_2d(np.asarray(initConds, dtype=float))
+        nOrbits = initConds.shape[0]
+        solution = np.empty((nOrbits, len(tau), 5))
+        for start in range(0, nOrbits, chunkSize):
+            chunk = initConds[start:start + chunkSize]
+            #Each orbit only couples to its own 5 variables, so the Jacobian is
+            #banded with 4 sub/super-diagonals
+            sol = self.integrate(self.SchwarzschildBatch, chunk.ravel(), tau,
+                args=(m,), ml=4, mu=4)
+            solution[start:start + chunk.shape[0]] = sol.reshape(
+                (len(tau), chunk.shape[0], 5)).transpose((1, 0, 2))
+        return solution
+
+    '''
+    Reduced Schwarzschild equations of motion for fixed energy and angular
+    momentum; only the radial equation is integrated, along with phi, which
+    has no closed form in terms of r
+    ################################################################################
+    y -> [r, phi, dr/dtau]
+    s -> Proper time; unused, but required by odeint's calling convention
+    l -> Conserved angular momentum per unit mass
+    m -> Mass of the central body
+    ################################################################################
+    Return dyds -> [dr/dtau, dphi/dtau, d2r/dtau2]
+    '''
+    def SchwarzschildRadial(self,y,s,l,m=1):
+        r, p, v = y
+        d1 = v
+        d2 = l/(r**2)
+        #Radial acceleration from the effective potential at fixed l
+        d3 = -m/(r**2) + (l**2)/(r**3) - 3*m*(l**2)/(r**4)
+        return [d1,d2,d3]
+
+    '''
+    Finds the turning points of an orbit in u = 1/r, i.e. the roots of the
+    effective-potential cubic
+        (du/dphi)**2 = 2m u**3 - u**2 + 2m u/l**2 + (e**2-1)/l**2
+    Vectorized; e and l may be scalars or arrays of matching/broadcastable shape
+    ################################################################################
+    e -> Conserved energy per unit mass
+    l -> Conserved angular momentum per unit mass (nonzero)
+    m -> Mass of the central body
+    ################################################################################
+    Return [u1, u2, u3] -> The roots in ascending order wherever all three are
+        real (including a double root, to within CUBIC_TOLERANCE); NaN wherever
+        the cubic only has one real root
+    '''
+    def potentialRoots(self,e, l, m=1):
+        e, l = np.broadcast_arrays(np.asarray(e, dtype=float), np.asarray(l, dtype=float))
+        #Monic form u**3 + a u**2 + b u + c, then shifted to the depressed cubic
+        #x**3 + p x + q via u = x - a/3
+        a = -1/(2*m)
+        b = 1/(l**2)
+        c = (e**2-1)/(2*m*(l**2))
+        p = b - (a**2)/3
+        q = 2*(a**3)/27 - a*b/3 + c
+        with np.errstate(invalid='ignore', divide='ignore'):
+            threeReal = (4*(p**3) + 27*(q**2)) <= CUBIC_TOLERANCE*(a**6)
+            #Trigonometric solution, valid whenever all three roots are real; p
+            #is clamped so a double (or triple) root that round-off pushed just
+            #past zero still comes out
+            amp = 2*np.sqrt(np.maximum(-p/3, 0))
+            cosine = np.where(p < 0, (3*q/(2*p))*np.sqrt(-3/p), 0)
+            theta = np.arccos(np.clip(cosine, -1, 1))/3
+            roots = [amp*np.cos(theta - 2*np.pi*k/3) - a/3 for k in (2, 1, 0)]
+        return [np.where(threeReal, root, np.nan) for root in roots]
+
+    '''
+    Closed-form orbit shape r(phi) of a bound Schwarzschild orbit, skipping the
+    ODE integration entirely:
+        u(phi) = u1 + (u2-u1) sn**2(phi sqrt(m(u3-u1)/2) + K(k), k)
+    with k**2 = (u2-u1)/(u3-u1) and u1 <= u2 <= u3 from potentialRoots()
+    ################################################################################
+    e -> Conserved energy per unit mass (array or scalar)
+    l -> Conserved angular momentum per unit mass (array or scalar)
+    phi -> 1D array of angles to evaluate r at, measured from periapsis;
+        defaults to two full revolutions
+    m -> Mass of the central body
+    ################################################################################
+    Return r -> Array of shape broadcast(e, l).shape + phi.shape; NaN for any
+        (e, l) that does not describe a bound orbit
+    '''
+    def analyticOrbit(self,e, l, phi=None, m=1):
+        if phi is None:
+            phi = np.linspace(0, 4*np.pi, 1000)
+        phi = np.asarray(phi, dtype=float)
+        u1, u2, u3 = [root[..., np.newaxis] for root in self.potentialRoots(e, l, m)]
+        with np.errstate(invalid='ignore'):
+            bound = (u1 > 0) & (u2 >= u1)
+            k2 = (u2-u1)/(u3-u1)
+            xi = phi*np.sqrt(m*(u3-u1)/2) + ellipk(k2)
+            sn = ellipj(xi, k2)[0]
+            r = 1/(u1 + (u2-u1)*(sn**2))
+        return np.where(bound, r, np.nan)
+
+    '''
+    Periapsis advance per radial period of a bound Schwarzschild orbit,
+        4 K(k)/sqrt(2m(u3-u1)) - 2 pi
+    using the same roots and modulus as analyticOrbit()
+    ################################################################################
+    e -> Conserved energy per unit mass (array or scalar)
+    l -> Conserved angular momentum per unit mass (array or scalar)
+    m -> Mass of the central body
+    ################################################################################
+    Return dphi -> Precession angle in radians, shaped like broadcast(e, l);
+        NaN for any (e, l) that does not describe a bound orbit
+    '''
+    def precessionAngle(self,e, l, m=1):
+        u1, u2, u3 = self.potentialRoots(e, l, m)
+        with np.errstate(invalid='ignore'):
+            bound = (u1 > 0) & (u2 >= u1)
+            k2 = (u2-u1)/(u3-u1)
+            dphi = 4*ellipk(k2)/np.sqrt(2*m*(u3-u1)) - 2*np.pi
+        return np.where(bound, dphi, np.nan)
+
+    '''
+    Classifies orbits without integrating them, from where the launch radius
+    sits relative to the roots of e**2 = (1-2m/r)(1+l**2/r**2); vectorized over
+    any broadcastable arrays of inputs
+    ################################################################################
+    e -> Conserved energy per unit mass
+    l -> Conserved angular momentum per unit mass
+    r_i -> Launch radius
+    pos -> Launch direction, True for outgoing (as in initcondgen()); only
+        matters for unbound orbits with no potential barrier in the way
+    m -> Mass of the central body
+    tol -> How far (e**2 - V(r_i)) may dip below zero and still count as a
+        launch at a turning point rather than inside the barrier
+    ################################################################################
+    Return info -> dict of arrays:
+        "class" -> ORBIT_BOUND, ORBIT_PLUNGE, ORBIT_SCATTER or ORBIT_FORBIDDEN
+            (launch inside the potential barrier or the horizon)
+        "periapsis", "apoapsis" -> Inner/outer turning radii of the region the
+            orbit moves in (NaN where there is none)
+        "rUnstable", "rStable" -> Unstable/stable circular orbit radii for l
+            (NaN when l**2 < 12 m**2)
+        "vBarrier" -> Height e**2 of the barrier peak at rUnstable
+        "aboveBarrier" -> e**2 exceeds the barrier peak (or there is none)
+        "belowIsco" -> l**2 < 12 m**2, so no stable circular orbit exists
+        "belowIsbo" -> l < 4m, so even e = 1 clears the barrier
+        "insideIsco", "insideIsbo" -> r_i < 6m and r_i < 4m respectively
+    '''
+    def classifyOrbit(self,e, l, r_i, pos, m=1, tol=1e-9):
+        e, l, r_i, pos = np.broadcast_arrays(
+            np.asarray(e, dtype=float),
+            np.abs(np.asarray(l, dtype=float)),
+            np.asarray(r_i, dtype=float),
+            np.asarray(pos, dtype=bool)
+            )
+        shape = e.shape
+        orbitClass = np.full(shape, ORBIT_PLUNGE)
+        periapsis = np.full(shape, np.nan)
+        apoapsis = np.full(shape, np.nan)
+
+        radial = l < 1e-12
+        lSafe = np.where(radial, 1.0, l)
+        u_i = 1/r_i
+        with np.errstate(invalid='ignore', divide='ignore'):
+            radialEnergy = e**2 - (1-2*m*u_i)*(1+(lSafe**2)*(u_i**2))
+            radialEnergy = np.where(radial, e**2 - 1 + 2*m*u_i, radialEnergy)
+            allowed = (radialEnergy >= -tol) & (r_i > 2*m)
+
+            u1, u2, u3 = self.potentialRoots(e, lSafe, m)
+            threeReal = ~np.isnan(u1) & ~radial
+            #With three real roots the allowed regions are u1 <= u <= u2 and
+            #u >= u3; split them at the barrier between u2 and u3
+            outer = threeReal & (u_i < (u2+u3)/2)
+            inner = threeReal & ~outer
+
+            orbitClass[outer & (u1 > 0)] = ORBIT_BOUND
+            orbitClass[outer & (u1 <= 0)] = ORBIT_SCATTER
+            periapsis = np.where(outer, 1/u2, periapsis)
+            apoapsis = np.where(outer & (u1 > 0), 1/u1, apoapsis)
+            apoapsis = np.where(inner, 1/u3, apoapsis)
+
+            #One real root (or radial infall): nothing stops an infalling orbit,
+            #and only unbound outgoing launches get away
+            open_ = ~threeReal
+            escapes = open_ & (e >= 1) & pos
+            orbitClass[escapes] = ORBIT_SCATTER
+            singleRoot = self.cubicRealRoot(e, lSafe, m)
+            apoapsis = np.where(open_ & ~radial & (e < 1), 1/singleRoot, apoapsis)
+            apoapsis = np.where(open_ & radial & (e < 1), 2*m/(1-e**2), apoapsis)
+
+            orbitClass[~allowed] = ORBIT_FORBIDDEN
+            periapsis = np.where(allowed, periapsis, np.nan)
+            apoapsis = np.where(allowed, apoapsis, np.nan)
+
+            #Circular orbits sit at the extrema of the effective potential
+            root = np.sqrt(1 - 12*(m**2)/(l**2))
+            rUnstable = (l**2)/(2*m)*(1-root)
+            rStable = (l**2)/(2*m)*(1+root)
+            vBarrier = (1-2*m/rUnstable)*(1+(l**2)/(rUnstable**2))
+            aboveBarrier = np.where(np.isnan(vBarrier), True, e**2 > vBarrier)
+
+        return {
+            "class":orbitClass,
+            "periapsis":periapsis,
+            "apoapsis":apoapsis,
+            "rUnstable":rUnstable,
+            "rStable":rStable,
+            "vBarrier":vBarrier,
+            "aboveBarrier":aboveBarrier,
+            "belowIsco":(l**2) < 12*(m**2),
+            "belowIsbo":l < 4*m,
+            "insideIsco":r_i < 6*m,
+            "insideIsbo":r_i < 4*m
+        }
+
+    '''
+    Real root in u of the effective-potential cubic for (e, l) where it only has
+    one (Cardano's formula); NaN wherever potentialRoots() finds three
+    ################################################################################
+    e -> Conserved energy per unit mass
+    l -> Conserved angular momentum per unit mass (nonzero)
+    m -> Mass of the central body
+    ################################################################################
+    '''
+    def cubicRealRoot(self,e, l, m=1):
+        a = -1/(2*m)
+        b = 1/(l**2)
+        c = (e**2-1)/(2*m*(l**2))
+        p = b - (a**2)/3
+        q = 2*(a**3)/27 - a*b/3 + c
+        with np.errstate(invalid='ignore'):
+            disc = (q**2)/4 + (p**3)/27
+            sqrtDisc = np.sqrt(disc)
+            root = np.cbrt(-q/2 + sqrtDisc) + np.cbrt(-q/2 - sqrtDisc) - a/3
+        return np.where(108*disc > CUBIC_TOLERANCE*(a**6), root, np.nan)
+
     def circlemaker(self,y,s,m=1):
         r,p,v,w = y
         d1 = 0
@@ -102,36 +443,35 @@ class Simulator():
 
 
 
-    def readSolData(self,filename):
-        #Get the header information from the very first line of the file, e.g., the
-        #strings identifying the data to follow in each associated column
-        header = [i for i in open(filename, 'r').readline().rstrip().split(",")]
-        #Grab and reshape the second line of data from the file so we don't need to know
-        #the actual number of fields we're taking in (WARNING: super hacky)
-        dOut = np.array([float(i) for i in open(filename, 'r').read().split("\n")[1].rstrip().split(",")])
-        #1 row, n columns where n is the number of values + 1 (for the independent variable)
-        dOut = dOut.reshape((1, dOut.shape[0]))
-        #Init the line to something generic but nonempty, will be overwritten anyway
-        l = "0"
-        hasSkipped = 0
-        #Properly open the file for reading this time
+    '''
+    Reads ODE solution data from a file in a single pass
+    ################################################################################
+    filename -> File to read data from (file is not affected); files ending in
+        TRAJECTORY_EXTENSION are opened as memory-mapped binary trajectories,
+        anything else is parsed as CSV
+    columns -> Optional list of the columns to read, given by header name or by
+        index (e.g. ["tau", "r", "phi"]); defaults to every column
+    ################################################################################
+    Return [header, dOut] -> The header names of the columns read, and a 2D array
+        of the file's contents, separated by field
+    '''
+    def readSolData(self,filename, columns=None):
+        #Binary trajectory files are memory-mapped rather than parsed
+        if isTrajectoryFile(filename):
+            header, dOut, info = readTrajectory(filename, columns)
+            return [header, dOut]
         with open(filename, 'r') as file:
-            #Until we reach the last line of the file
-            while l != "":
-                #Get the line and remove whitespace/newline characters
-                l = file.readline().rstrip()
-                #Make sure we skip the first, second and last lines so we don't include
-                #them twice/at all, respectively
-                if l != "" and hasSkipped > 1:
-                    #Separate each field by the commas and make a new array of those
-                    #values casted to floats
-                    lineVals = np.array([float(i) for i in l.split(",")])
-                    #Stick this new array onto the end of the output array to build
-                    #up the full set of data, now separated by field
-                    dOut = np.append(dOut, lineVals.reshape((1, lineVals.shape[0])), axis=0)
-                #Change this after the first two loops so we don't accidentally skip
-                #everything
-                hasSkipped += 1
+            #Get the header information from the very first line of the file, e.g.,
+            #the strings identifying the data to follow in each associated column
+            header = file.readline().rstrip().split(",")
+            usecols = None
+            if columns is not None:
+                usecols = [header.index(col) if isinstance(col, str) else col
+                    for col in columns]
+                header = [header[col] for col in usecols]
+            #Parse the rest of the file in bulk, picking up where the header
+            #left off
+            dOut = np.loadtxt(file, delimiter=",", usecols=usecols, ndmin=2)
         #Return the full set of separated data, along with the header information
         return [header, dOut]
 
@@ -146,38 +486,414 @@ class Simulator():
         (defined as functions somewhere else in this file, passed "by reference")
     axisNames -> A list of names by which each column will be identified in the
         output file; will serve as the header
+    stopConditions -> Optional dict of keyword arguments for getSolDataEvents();
+        when given, only the part of the run before the first terminating event
+        is written
+    solverOptions -> Extra keyword arguments for getSolData(), e.g.
+        {"reduced": True, "rtol": 1e-6}
+    precision -> Significant digits per value, see writeSolArray()
+    progress -> Optional callback, passed the fraction of indVals integrated so
+        far (see getSolData())
+    checkpointEvery -> If given, the file is written as the run goes, appended to
+        after every checkpointEvery of proper time, so a run that crashes or is
+        cancelled can be picked up again with extendSolData()
     ################################################################################
     Return True -> Returns true if writing was successful
     '''
     def writeSolData(self,filename, initConditions, indVals, derivatives, axisNames,
-        extraparams=[]):
+        extraparams=[], stopConditions=None, solverOptions={}, precision=None,
+        progress=None, checkpointEvery=None):
         #extra params modify diffeq, input directly
-        #Find the solution with helper method
-        rVals = self.getSolData(initConditions, indVals, derivatives,extraparams)
+        if checkpointEvery is not None:
+            #Start the file off with just the initial state (which is exactly the
+            #first row any of the solvers produce) and grow it from there
+            indVals = np.asarray(indVals, dtype=float)
+            metadata = self.runMetadata(initConditions, derivatives, stopConditions,
+                solverOptions)
+            self.writeSolArray(filename, indVals[:1], np.array([initConditions],
+                dtype=float), axisNames, precision=precision, metadata=metadata,
+                capacity=indVals.shape[0])
+            self.extendSolData(filename, indVals=indVals[1:], derivatives=derivatives,
+                stopConditions=stopConditions, solverOptions=solverOptions,
+                precision=precision, progress=progress,
+                checkpointEvery=checkpointEvery)
+            return True
+        rVals, metadata = self.solveSolData(initConditions, indVals, derivatives,
+            extraparams, stopConditions, solverOptions, progress)
+        return self.writeSolArray(filename, indVals, rVals, axisNames,
+            precision=precision, metadata=metadata)
+
+    '''
+    Continues a stored run from its last row, integrating only the new interval
+    and appending it to the same file (CSV files are appended to, binary files
+    grown in place). With checkpointEvery set, the file is appended to as the
+    run goes, so it always holds everything integrated so far.
+    The solver restarts from the stored state, so the continued part agrees with
+    an uninterrupted run to within the integration tolerances rather than
+    bit for bit
+    ################################################################################
+    filename -> File written by writeSolData()
+    tauEnd -> Proper time to continue to, on the spacing of the file's last two
+        rows
+    indVals -> Alternatively, the exact new independent variable values, all
+        after the file's last one
+    derivatives -> The ODE system; defaults to the Simulator method named in a
+        binary file's metadata, or Schwarzschild() for CSV files
+    stopConditions, solverOptions -> As for writeSolData(); default to what a
+        binary file's metadata recorded (none for CSV files). maxPeriapses
+        counts the passages from the stored state on, carried across the
+        checkpoints of this call (those already in the file aren't known)
+    precision -> Significant digits per value, for CSV files
+    progress -> Optional callback, passed the fraction of the new interval
+        integrated so far
+    checkpointEvery -> Proper time between appends (None to append once, at the
+        end)
+    ################################################################################
+    Return rows -> Number of rows added (fewer than asked for if a stop
+        condition ended the run)
+    '''
+    def extendSolData(self,filename, tauEnd=None, indVals=None, derivatives=None,
+        stopConditions=None, solverOptions=None, precision=None, progress=None,
+        checkpointEvery=None):
+        header, tail, metadata = self.readFinalState(filename)
+        tau0 = tail[-1, 0]
+        state = tail[-1, 1:]
+
+        if indVals is None:
+            if tail.shape[0] < 2:
+                raise ValueError("Need two stored rows to tell the spacing; pass indVals")
+            step = tail[-1, 0] - tail[-2, 0]
+            count = int(round((tauEnd - tau0)/step))
+            indVals = tau0 + step*np.arange(1, count + 1)
+        indVals = np.asarray(indVals, dtype=float)
+        if indVals.shape[0] == 0:
+            return 0
+        if indVals[0] <= tau0:
+            raise ValueError("New values must all come after the stored tau = " + str(tau0))
+
+        if derivatives is None:
+            derivatives = getattr(self, metadata.get("derivatives", "Schwarzschild"), None)
+            if not callable(derivatives):
+                raise ValueError("Can't tell which equations " + str(filename) +
+                    " was made with; pass derivatives")
+        if stopConditions is None:
+            stopConditions = metadata.get("stopConditions")
+        if solverOptions is None:
+            solverOptions = metadata.get("solverOptions") or {}
+
+        #Split the new interval into pieces ending at each checkpoint
+        if checkpointEvery is None:
+            bounds = [0, indVals.shape[0]]
+        else:
+            marks = np.arange(tau0 + checkpointEvery, indVals[-1], checkpointEvery)
+            bounds = [0] + list(np.searchsorted(indVals, marks, side='right')) + [indVals.shape[0]]
+        span = indVals[-1] - tau0
+
+        added = 0
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            if stop <= start:
+                continue
+            #Each piece starts from the last stored row, which the solver hands
+            #back unchanged as its first row
+            grid = np.concatenate([[tau0], indVals[start:stop]])
+            pieceProgress = None
+            if progress is not None:
+                pieceProgress = lambda fraction, lo=grid[0], hi=grid[-1]: progress(
+                    (lo - tail[-1, 0] + fraction*(hi - lo))/span)
+            rVals, events = self.solveSolEvents(state, grid, derivatives,
+                stopConditions=stopConditions, solverOptions=solverOptions,
+                progress=pieceProgress)
+            newRows = rVals.shape[0] - 1
+            if newRows > 0:
+                self.writeSolArray(filename, grid[1:], rVals[1:], header,
+                    precision=precision, append=True)
+                added += newRows
+            #Later pieces only get the periapses this one didn't use
+            stopConditions, finished = self.remainingStopConditions(stopConditions,
+                events)
+            if finished or rVals.shape[0] < grid.shape[0]:
+                #A stop condition ended the run
+                break
+            tau0 = grid[-1]
+            state = rVals[-1]
+        if progress is not None:
+            progress(1.0)
+        return added
+
+    '''
+    Generator version of getSolData() for runs too long to hold in memory; the
+    run is integrated a chunk of rows at a time and each chunk is handed out and
+    forgotten, so memory use depends on chunkRows and not on the run length.
+    See Stream.py for consumers (file writer, decimator, periapsis finder, live
+    plot). Each chunk restarts the solver from the last row of the one before,
+    so results agree with a single solve to within the integration tolerances
+    ################################################################################
+    initConditions -> Initial conditions for the solver
+    tauEnd -> Proper time to integrate to
+    step -> Proper time between rows
+    derivatives -> The ODE system being solved (e.g. self.Schwarzschild)
+    tauStart -> Proper time of the initial conditions
+    chunkRows -> Rows per chunk
+    stopConditions, solverOptions -> As for writeSolData(); with stop
+        conditions, the stream ends at the first terminating event (event counts
+        such as maxPeriapses run over the whole stream, not per chunk)
+    progress -> Optional callback, passed the fraction of the run done after
+        each chunk
+    ################################################################################
+    Yields [tau, rVals] -> 1D array of proper times and the (n, V) solution rows
+        at them; the first chunk starts with the initial conditions
+    '''
+    def streamSolData(self,initConditions, tauEnd, step, derivatives, tauStart=0,
+        chunkRows=DEFAULT_STREAM_ROWS, stopConditions=None, solverOptions={},
+        progress=None):
+        #Chunks aren't worth caching, and would only push everything else out
+        solver = Simulator()
+        count = int(round((tauEnd - tauStart)/step)) + 1
+        state = np.asarray(initConditions, dtype=float)
+        done = 0
+        while done < count:
+            #Every chunk but the first starts on the last row of the one before,
+            #which the solver hands back unchanged
+            first = done - 1 if done else 0
+            stop = min(first + chunkRows + 1, count)
+            grid = tauStart + step*np.arange(first, stop)
+            rVals, events = solver.solveSolEvents(state, grid, derivatives,
+                stopConditions=stopConditions, solverOptions=solverOptions)
+            skip = 0 if done == 0 else 1
+            if rVals.shape[0] > skip:
+                yield [grid[skip:rVals.shape[0]], rVals[skip:]]
+            if progress is not None:
+                progress((stop - 1)/max(count - 1, 1))
+            #Later chunks only get the periapses this one didn't use
+            stopConditions, finished = solver.remainingStopConditions(stopConditions,
+                events)
+            if finished or rVals.shape[0] < grid.shape[0]:
+                #A stop condition ended the run
+                return
+            state = rVals[-1]
+            done = stop
+            del rVals
+
+    '''
+    Reads just the end of a solution file, without loading all of it
+    ################################################################################
+    filename -> CSV or binary trajectory file; a CSV file whose last line was
+        only partly written (e.g. by a run that crashed) is cut back to its last
+        complete line
+    ################################################################################
+    Return [header, tail, metadata] -> Field names, the last (up to) two rows as
+        a 2D array and the metadata of a binary file ({} for CSV files)
+    '''
+    def readFinalState(self,filename):
+        if isTrajectoryFile(filename):
+            header, dOut, info = readTrajectory(filename)
+            return [header, np.array(dOut[-2:]), info["metadata"]]
+
+        #Only read, so read-only files can be looked at; the file is reopened to
+        #cut a partial last line off once one is found
+        with open(filename, 'rb') as file:
+            header = file.readline().decode("utf-8").strip().split(",")
+            file.seek(0, os.SEEK_END)
+            end = file.tell()
+            fileEnd = end
+            size = min(end, 4096)
+            while True:
+                file.seek(end - size)
+                chunk = file.read(size)
+                if not chunk.endswith(b"\n"):
+                    #Drop the partial line, then look again
+                    cut = chunk.rfind(b"\n")
+                    if cut < 0 and size < end:
+                        size = min(end, 2*size)
+                        continue
+                    if cut < 0:
+                        raise ValueError(str(filename) + " has no complete lines")
+                    end = end - size + cut + 1
+                    size = min(end, 4096)
+                    continue
+                lines = chunk.splitlines()
+                #The first line in the chunk is either the header or cut off
+                if size == end or len(lines) >= 3:
+                    break
+                size = min(end, 2*size)
+        if end < fileEnd:
+            with open(filename, 'rb+') as file:
+                file.truncate(end)
+        tail = np.array([[float(val) for val in line.split(b",")] for line in lines[1:][-2:]])
+        if tail.shape[0] == 0:
+            raise ValueError(str(filename) + " has no rows")
+        return [header, tail, {}]
+
+    '''
+    Describes how a run was made, for the header of binary files
+    ################################################################################
+    initConditions, derivatives, stopConditions, solverOptions -> As for
+        writeSolData()
+    ################################################################################
+    Return metadata -> dict of the run settings
+    '''
+    def runMetadata(self,initConditions, derivatives, stopConditions=None,
+        solverOptions={}):
+        return {
+            "initConditions":[float(val) for val in initConditions],
+            "mass":1,
+            "derivatives":getattr(derivatives, "__name__", str(derivatives)),
+            "solverOptions":solverOptions,
+            "stopConditions":stopConditions
+        }
+
+    '''
+    Determines the solution to the provided ODEs, along with a description of the
+    run, without writing anything; the first half of writeSolData()
+    ################################################################################
+    initConditions, indVals, derivatives, extraparams, stopConditions,
+        solverOptions, progress -> As for writeSolData()
+    ################################################################################
+    Return [rVals, metadata] -> The (T, V) solution (T may be short of
+        len(indVals) if a stop condition ended the run) and a dict describing how
+        it was made, as stored in the header of binary files
+    '''
+    def solveSolData(self,initConditions, indVals, derivatives, extraparams=[],
+        stopConditions=None, solverOptions={}, progress=None):
+        rVals, events = self.solveSolEvents(initConditions, indVals, derivatives,
+            extraparams, stopConditions, solverOptions, progress)
+        metadata = self.runMetadata(initConditions, derivatives, stopConditions,
+            solverOptions)
+        return [rVals, metadata]
+
+    '''
+    Determines the solution to the provided ODEs along with the events found on
+    the way, for callers that solve a run in pieces and need to keep count of them
+    ################################################################################
+    initConditions, indVals, derivatives, extraparams, stopConditions,
+        solverOptions, progress -> As for writeSolData()
+    ################################################################################
+    Return [rVals, events] -> The (T, V) solution as for solveSolData(), and the
+        events from getSolDataEvents() ([] without stop conditions)
+    '''
+    def solveSolEvents(self,initConditions, indVals, derivatives, extraparams=[],
+        stopConditions=None, solverOptions={}, progress=None):
+        #Find the solution with helper method; if stop conditions were given,
+        #the run ends early at the first terminating event
+        if stopConditions is None:
+            rVals = self.getSolData(initConditions, indVals, derivatives,extraparams,
+                progress=progress, **solverOptions)
+            return [rVals, []]
+        #Of the solver options, only the tolerances apply to the event solver
+        tolerances = {key:solverOptions[key] for key in ["rtol", "atol"]
+            if key in solverOptions}
+        return self.getSolDataEvents(initConditions, indVals, derivatives,
+            progress=progress, **stopConditions, **tolerances)
+
+    '''
+    Stop conditions for carrying on with a run that has already been through some
+    of its events, with maxPeriapses cut down by the periapses already passed
+    ################################################################################
+    stopConditions -> dict for getSolDataEvents(), or None
+    events -> Events of the run so far, as from getSolDataEvents()
+    ################################################################################
+    Return [stopConditions, finished] -> The stop conditions for the rest of the
+        run, and whether it has already passed all its maxPeriapses
+    '''
+    def remainingStopConditions(self,stopConditions, events):
+        if not stopConditions or not stopConditions.get("maxPeriapses"):
+            return [stopConditions, False]
+        passed = sum(1 for event in events if event["type"] == "periapsis")
+        remaining = int(stopConditions["maxPeriapses"]) - passed
+        return [dict(stopConditions, maxPeriapses=remaining), remaining <= 0]
+
+    '''
+    Writes an already computed solution to a CSV file, formatting whole blocks of
+    rows at once rather than one value at a time
+    ################################################################################
+    filename -> Name of file to put the data in (cleared when accessed)
+    indVals -> Independent variable values, written as the first column; only
+        the first len(rVals) are used, so truncated solutions are fine
+    rVals -> 2D (T, V) array of solution values, one row per "timestep"
+    axisNames -> List of V + 1 column names to write as the header
+    precision -> Significant digits to write each value with; None writes the
+        shortest string that round-trips exactly, which is byte-for-byte what
+        str() produced for earlier files
+    chunkRows -> Number of rows formatted and written per block
+    metadata -> Extra run information (initial conditions, mass, ...) kept in
+        the header of binary files; CSV files have nowhere to put it
+    capacity -> Rows to reserve in a binary file, so it can be appended to in
+        place later (see writeTrajectory())
+    append -> If True, add the rows to the end of an existing file instead
+        (axisNames and metadata are then taken as already written)
+    ################################################################################
+    Return True -> Returns true if writing was successful
+    '''
+    def writeSolArray(self,filename, indVals, rVals, axisNames, precision=None,
+        chunkRows=8192, metadata=None, capacity=None, append=False):
+        args = (filename, indVals, rVals, axisNames, precision, chunkRows, metadata,
+            capacity, append)
+        if self.metrics is None:
+            return self.writeSolFile(*args)
+        before = fileBytes(filename) if append else 0
+        with self.metrics.stage("write"):
+            written = self.writeSolFile(*args)
+        self.metrics.count("bytesWritten", fileBytes(filename) - before)
+        return written
+
+    '''
+    Does the writing for writeSolArray(), which takes the same arguments
+    ################################################################################
+    '''
+    def writeSolFile(self,filename, indVals, rVals, axisNames, precision, chunkRows,
+        metadata, capacity, append):
+        #Pick the format from the file extension
+        if isTrajectoryFile(filename):
+            if append:
+                appendTrajectory(filename, indVals, rVals)
+                return True
+            return writeTrajectory(filename, indVals, rVals, axisNames, metadata,
+                capacity=capacity)
         #Get the number of "timesteps" completed (rows) and the
         #number of value fields (columns) of the 2d output array
         steps, vals = rVals.shape
-        #Open the file at filename for writing (deletes its previous contents)
-        with open(filename, 'w') as file:
-
-            for ind in range(vals + 1):
-                if ind != vals:
-                    file.write(axisNames[ind] + ",")
-                else:
-                    file.write(axisNames[ind] + "\n")
-            #For each "timestep"
-            for tIndex in range(steps):
-                #write the "time" value as the first field in each row
-                file.write(str(indVals[tIndex]))
-                #For each additional value field
-                for valIndex in range(vals):
-                    #comma separate them then write the value
-                    file.write("," + str(rVals[tIndex, valIndex]))
-                #add a newline character to complete the line and advance the loop
-                file.write("\n")
+        indVals = np.asarray(indVals, dtype=float)
+        #"%r" on a Python float gives the same shortest round-trip form as str()
+        field = "%r" if precision is None else "%." + str(int(precision)) + "g"
+        rowFormat = ",".join([field] * (vals + 1))
+        #Open the file at filename for writing (deletes its previous contents),
+        #or for adding to
+        with open(filename, 'a' if append else 'w', buffering=1 << 20) as file:
+            if not append:
+                file.write(",".join(axisNames[:vals + 1]) + "\n")
+            for start in range(0, steps, chunkRows):
+                stop = min(start + chunkRows, steps)
+                #Lay the "time" column next to the value fields for this block
+                block = np.empty((stop - start, vals + 1))
+                block[:, 0] = indVals[start:stop]
+                block[:, 1:] = rVals[start:stop]
+                #Format the whole block with a single string operation
+                blockFormat = (rowFormat + "\n") * (stop - start)
+                file.write(blockFormat % tuple(block.ravel().tolist()))
         #Return True if writing succeeded
         return True
 
+    '''
+    Converts a solution file between the CSV and binary trajectory formats
+    ################################################################################
+    source -> File to convert (not affected)
+    destination -> File to write; defaults to source with its extension swapped
+        (.dat -> TRAJECTORY_EXTENSION and back)
+    ################################################################################
+    Return destination -> Name of the file written
+    '''
+    def convertSolData(self,source, destination=None):
+        if destination is None:
+            base = os.path.splitext(source)[0]
+            destination = base + (".dat" if isTrajectoryFile(source) else TRAJECTORY_EXTENSION)
+        header, dOut = self.readSolData(source)
+        metadata = {}
+        if isTrajectoryFile(source):
+            metadata = readTrajectoryHeader(source)["metadata"]
+        self.writeSolArray(destination, dOut[:, 0], dOut[:, 1:], header,
+            metadata=metadata)
+        return destination
+
     '''
     Helper method that actually does the integration for writeSolData()
     (for possible expansion later, currently fairly pointless)
@@ -187,88 +903,334 @@ class Simulator():
         integrating the ode (e.g., timestep, in most cases)
     derivatives -> The actual ODE or system of ODE's we'll be solving
         (defined as functions somewhere else in this file, passed "by reference")
+    reduced -> If True, integrate the reduced radial system with
+        getReducedSolData() instead; derivatives is ignored in that case
+    rtol, atol -> Tolerances handed to odeint() (None for its defaults)
+    progress -> Optional callback, passed the fraction of indVals covered as
+        the integration goes (see reportProgress())
     ################################################################################
     Returns the odeint() method's output for the given conditions/derivatives
     '''
-    def getSolData(self,initConditions, indVals, derivatives,extraparams):
-        return odeint(derivatives, initConditions, indVals)
+    def getSolData(self,initConditions, indVals, derivatives,extraparams=[],
+        reduced=False, rtol=None, atol=None, progress=None):
+        def solve():
+            if reduced:
+                return {"solution":self.getReducedSolData(initConditions, indVals,
+                    rtol=rtol, atol=atol, progress=progress)}
+            reporting = derivatives
+            if progress is not None:
+                reporting = reportProgress(derivatives, indVals, progress)
+            return {"solution":self.integrate(reporting, initConditions, indVals,
+                rtol=rtol, atol=atol)}
+
+        parts = {
+            "integrator":"odeint",
+            "initConditions":initConditions,
+            "indVals":np.asarray(indVals),
+            "derivatives":None if reduced else derivatives,
+            "reduced":reduced,
+            "mass":1,
+            "rtol":rtol,
+            "atol":atol
+        }
+        return self.cachedSolve(parts, solve, progress)["solution"]
 
+    '''
+    Looks a result up in the cache, computing (and storing) it on a miss
+    ################################################################################
+    parts -> dict of everything the result depends on, see ResultCache.makeKey()
+    solve -> Function computing the result as a dict of arrays
+    progress -> Progress callback of the run, told it's complete on a hit
+    ################################################################################
+    Return arrays -> dict of arrays, from the cache or from solve(); solve() is
+        called directly if some part can't be keyed (e.g. a lambda)
+    '''
+    def cachedSolve(self,parts, solve, progress=None):
+        if self.cache is None:
+            return solve()
+        try:
+            key = self.cache.makeKey(parts)
+        except UncacheableError:
+            return solve()
+        arrays = self.cache.get(key)
+        hit = arrays is not None
+        if not hit:
+            arrays = solve()
+            self.cache.put(key, arrays)
+        elif progress is not None:
+            progress(1.0)
+        if self.metrics is not None:
+            self.metrics.count("cacheHits" if hit else "cacheMisses")
+        return arrays
 
     '''
-    Default R^N to R^2 mapping for the plotSolData() method; truncates the passed
-        array to include only the columns specified by their index in locs.
-        Expected to be replaced by additional methods for any
-        realistic application, but provides an example of what is necessary
+    Integrates a Schwarzschild orbit using only the radial equation, with the
+    energy and angular momentum held at the values set by the initial conditions
     ################################################################################
-    arr2 -> 2D (N, V) array containing some time and/or axis data
-    locs -> A list of V' distinct indices of the columns containing the data we want
-     to pass as output
-    ################################################################################
-    Return outArray -> A 2D (N, V') array that's mapped the V columns of the input
-        array to V' in the output array, in this case simply by truncation
-    '''
-    def defaultConversion(arr2, locs):
-        row = np.array([])
-        outArray = np.empty((1, len(locs)))
-        for index in range(arr2.shape[0]):
-            #Append the same first-two-column-slice as additional rows of the
-            #output array.
-            #In an actual application, this row would be replaced by the desired
-            #coordinate conversion between the V elements and Cartesian coordinates.
-            for val in range(len(locs)):
-                row.append(arr2[index, val])
-            outArray = np.append(outArray, val.reshape((1, val.shape[1])), axis=0)
-            row = np.array([])
-        #Return the now (N, V') mapped array as the output, snipping the first
-        #empty row to avoid weird data effects
-        return outArray[1:, :]
+    initConditions -> Initial conditions in the [r, phi, dt/dtau, dr/dtau,
+        dphi/dtau] layout of Schwarzschild(), e.g. from initcondgen()
+    indVals -> Range of proper time values to report the solution at
+    m -> Mass of the central body
+    rtol, atol -> Tolerances handed to odeint() (None for its defaults); these
+        can usually be looser than for the full system, since e and l cannot
+        drift
+    progress -> Optional progress callback, as for getSolData()
+    ################################################################################
+    Return solution -> (T, 5) array in the same layout Schwarzschild() produces,
+        with dt/dtau and dphi/dtau rebuilt from e, l and r
+    '''
+    def getReducedSolData(self,initConditions, indVals, m=1, rtol=None, atol=None,
+        progress=None):
+        r0, p0, a0, v0, w0 = initConditions
+        e = (1-(2*m/r0))*a0
+        l = (r0**2)*w0
+
+        radial = self.SchwarzschildRadial
+        if progress is not None:
+            radial = reportProgress(radial, indVals, progress)
+        reducedSol = self.integrate(radial, [r0, p0, v0], indVals,
+            args=(l, m), rtol=rtol, atol=atol)
+        r = reducedSol[:, 0]
+
+        solution = np.empty((reducedSol.shape[0], 5))
+        solution[:, 0] = r
+        solution[:, 1] = reducedSol[:, 1]
+        solution[:, 2] = e/(1-(2*m/r))
+        solution[:, 3] = reducedSol[:, 2]
+        solution[:, 4] = l/(r**2)
+        return solution
+
+    '''
+    Event-driven alternative to getSolData() that stops the integration as soon
+    as the orbit's outcome is decided, instead of always running to the end of
+    indVals
+    ################################################################################
+    initConditions -> Initial conditions for the solver, in the
+        [r, phi, dt/dtau, dr/dtau, dphi/dtau] layout of Schwarzschild()
+    indVals -> Range of proper time values to report the solution at
+    derivatives -> The ODE system being solved (e.g. self.Schwarzschild)
+    m -> Mass of the central body
+    horizonEpsilon -> Stop once r <= 2m(1 + horizonEpsilon), before the
+        (1-2m/r)**-1 terms in the equations of motion blow up
+    escapeRadius -> Stop once r grows past this radius (None to never stop)
+    maxPeriapses -> Stop after this many periapsis passages (None to never stop);
+        launching at periapsis doesn't count as one
+    rtol, atol -> Tolerances for the integrator (None for odeint()'s defaults)
+    progress -> Optional progress callback, as for getSolData()
+    ################################################################################
+    Return [solution, events] -> solution is the odeint()-style (T', 5) array
+        truncated to the T' values of indVals reached before stopping; events is
+        a list of dicts with the "type" ("horizon", "escape", "periapsis" or
+        "apoapsis"), "tau" and "state" of every event found, in order (a launch
+        at a turning point is not itself an event)
+    '''
+    def getSolDataEvents(self,initConditions, indVals, derivatives, m=1,
+        horizonEpsilon=1e-3, escapeRadius=None, maxPeriapses=None, rtol=None,
+        atol=None, progress=None):
+        indVals = np.asarray(indVals, dtype=float)
+        parts = {
+            "integrator":"solve_ivp/LSODA",
+            "initConditions":initConditions,
+            "indVals":indVals,
+            "derivatives":derivatives,
+            "mass":m,
+            "horizonEpsilon":horizonEpsilon,
+            "escapeRadius":escapeRadius,
+            "maxPeriapses":maxPeriapses,
+            "rtol":rtol,
+            "atol":atol
+        }
+        arrays = self.cachedSolve(parts, lambda: self.solveEvents(initConditions,
+            indVals, derivatives, m, horizonEpsilon, escapeRadius, maxPeriapses,
+            progress, rtol, atol), progress)
+
+        events = []
+        for name, tau, state in zip(arrays["eventTypes"], arrays["eventTaus"],
+            arrays["eventStates"]):
+            events.append({"type": str(name), "tau": tau, "state": state})
+        return [arrays["solution"], events]
+
+    '''
+    Does the integration for getSolDataEvents(), returning the solution and its
+    events as plain arrays so they can be cached
+    ################################################################################
+    Arguments as for getSolDataEvents()
+    ################################################################################
+    Return arrays -> dict with the "solution" array and the "eventTypes",
+        "eventTaus" and "eventStates" of every event, in order
+    '''
+    def solveEvents(self,initConditions, indVals, derivatives, m,
+        horizonEpsilon, escapeRadius, maxPeriapses, progress, rtol=None, atol=None):
+        if progress is not None:
+            derivatives = reportProgress(derivatives, indVals, progress)
+
+        #solve_ivp wants f(tau, y) while our equations take (y, tau)
+        def rhs(tau, y):
+            return derivatives(y, tau)
+
+        def horizon(tau, y):
+            return y[0] - 2*m*(1 + horizonEpsilon)
+        horizon.terminal = True
+        horizon.direction = -1
+
+        def periapsis(tau, y):
+            return y[3]
+        periapsis.terminal = 0 if maxPeriapses is None else int(maxPeriapses)
+        periapsis.direction = 1
+        #Launching at a turning point (dr/dtau = 0) makes solve_ivp report it as
+        #an event at indVals[0]; that isn't a passage, so it's dropped below and
+        #mustn't use up one of the maxPeriapses
+        launchPeriapsis = (initConditions[3] == 0
+            and rhs(indVals[0], np.asarray(initConditions, dtype=float))[3] > 0)
+        if periapsis.terminal and launchPeriapsis:
+            periapsis.terminal += 1
+
+        def apoapsis(tau, y):
+            return y[3]
+        apoapsis.direction = -1
+
+        eventFuncs = [horizon, periapsis, apoapsis]
+        eventNames = ["horizon", "periapsis", "apoapsis"]
+
+        if escapeRadius is not None:
+            def escape(tau, y):
+                return y[0] - escapeRadius
+            escape.terminal = True
+            escape.direction = 1
+            eventFuncs.append(escape)
+            eventNames.append("escape")
+
+        #Tolerances default to odeint()'s so both paths agree
+        with self.stage("integrate"):
+            sol = solve_ivp(rhs, (indVals[0], indVals[-1]), initConditions,
+                method="LSODA", t_eval=indVals, events=eventFuncs,
+                rtol=DEFAULT_TOLERANCE if rtol is None else rtol,
+                atol=DEFAULT_TOLERANCE if atol is None else atol)
+        if self.metrics is not None:
+            #solve_ivp reports neither LSODA's step count nor its rejected steps
+            self.metrics.countIntegration(sol.nfev, None, sol.njev)
+
+        events = []
+        for name, taus, states in zip(eventNames, sol.t_events, sol.y_events):
+            for tau, state in zip(taus, states):
+                if tau == indVals[0] and name in ("periapsis", "apoapsis"):
+                    continue
+                events.append([tau, name, state])
+        events.sort(key=lambda event: event[0])
+
+        return {
+            "solution":sol.y.T,
+            "eventTypes":np.array([event[1] for event in events], dtype=str),
+            "eventTaus":np.array([event[0] for event in events], dtype=float),
+            "eventStates":np.array([event[2] for event in events],
+                dtype=float).reshape((len(events), len(initConditions)))
+        }
+
+    '''
+    Measures how far a Schwarzschild solution strays from what should stay fixed
+    along it: the energy E = (1-2m/r) dt/dtau, the angular momentum
+    L = r^2 dphi/dtau, and the normalization u.u = -1 of the 4-velocity.
+    Drift is measured from the first row, so it reflects integration error
+    only; a launch that isn't a valid 4-velocity (e.g. initcondgen() with an e
+    below the effective potential at r_i, whose dr/dtau comes out of an
+    absolute value) shows up in "launchError" instead.
+    Solutions from getReducedSolData() hold E and L fixed by construction, so
+    only their normalization can drift
+    ################################################################################
+    solution -> (T, 5) array in the layout of Schwarzschild()
+    m -> Mass of the central body
+    ################################################################################
+    Return drift -> dict with the "max" and "rms" drift over the run of each of
+        "energy" and "angularMomentum" (relative to the first row's value, or
+        absolute if that is 0) and "normalization" (absolute), plus "max", the
+        largest of the three maxima, and "launchError", |u.u + 1| in the first
+        row
+    '''
+    def conservationDrift(self,solution, m=1):
+        solution = np.asarray(solution, dtype=float)
+        if solution.shape[0] == 0:
+            solution = np.full((1, 5), np.nan)
+        r, p, a, v, w = solution.T
+        f = 1 - 2*m/r
+
+        invariants = {
+            "energy":f*a,
+            "angularMomentum":(r**2)*w,
+            "normalization":-f*(a**2) + (v**2)/f + (r*w)**2
+        }
+        drift = {}
+        for name, values in invariants.items():
+            deviation = np.abs(values - values[0])
+            if name != "normalization" and values[0] != 0:
+                deviation /= abs(values[0])
+            drift[name] = {"max":float(np.nan_to_num(np.max(deviation))),
+                "rms":float(np.nan_to_num(np.sqrt(np.mean(deviation**2))))}
+        drift["max"] = max(drift[name]["max"] for name in invariants)
+        drift["launchError"] = float(np.nan_to_num(abs(invariants["normalization"][0] + 1)))
+        return drift
+
+    '''
+    Finds the loosest (and so cheapest) integrator tolerances whose solution
+    stays within a drift budget, by solving with each of a ladder of tolerances
+    from loosest to tightest until one meets it. With a cache, the run at the
+    chosen tolerances is then read back rather than solved again
+    ################################################################################
+    initConditions, indVals -> The run to tune for; drift grows along a run,
+        so tune over the full span (or one at least as long)
+    budget -> Largest conservationDrift()["max"] to accept
+    derivatives -> The ODE system being solved (defaults to Schwarzschild)
+    stopConditions -> As for solveSolData(); if given, the event solver is
+        tuned instead of odeint()
+    reduced -> Tune getSolData()'s reduced solver instead (ignored with
+        stopConditions)
+    candidates -> Tolerances to try, used as both rtol and atol, loosest first
+    ################################################################################
+    Return tuning -> dict with the chosen "rtol" and "atol", whether the budget
+        was "met" (if not, the tightest candidate is chosen), its "drift", and
+        the "trials" made, each with the "rtol", "atol", "maxDrift" and
+        "seconds" taken
+    '''
+    def tuneTolerances(self,initConditions, indVals, budget, derivatives=None,
+        stopConditions=None, reduced=False, candidates=TOLERANCE_LADDER):
+        if derivatives is None:
+            derivatives = self.Schwarzschild
+        trials = []
+        for tolerance in candidates:
+            start = time.perf_counter()
+            if stopConditions is None:
+                solution = self.getSolData(initConditions, indVals, derivatives,
+                    reduced=reduced, rtol=tolerance, atol=tolerance)
+            else:
+                solution, events = self.getSolDataEvents(initConditions, indVals,
+                    derivatives, rtol=tolerance, atol=tolerance, **stopConditions)
+            drift = self.conservationDrift(solution)
+            trials.append({"rtol":tolerance, "atol":tolerance, "maxDrift":drift["max"],
+                "seconds":time.perf_counter() - start})
+            if drift["max"] <= budget:
+                break
+        return {"rtol":tolerance, "atol":tolerance, "met":drift["max"] <= budget,
+            "drift":drift, "trials":trials}
 
 
+    '''
+    Default R^N to R^2 mapping for the plotSolData() method; truncates the passed
+        array to include only the columns specified by their index in locs.
+        See Conversions.py for this and the other available mappings
+    '''
+    defaultConversion = staticmethod(selectColumns)
+
     '''
     Maps the input from 2D polar to 2D Cartesian input, via the standard r * cos(th)
-        and r * sin(th) transformations, using the same general methodology as in
-        the default version
+        and r * sin(th) transformations (see Conversions.polarToCartesian())
     ################################################################################
     arr2 -> 2D (N, V) array containing some time and/or axis data
     locs -> A list containing at least two indices, specifying the locations of the
         r and theta columns in arr2 for access
+    out -> Optional preallocated (N, 2) array to write the result into
     ################################################################################
     '''
-    def paramConversion(self,arr2, locs):
-        outArray = np.empty((1, len(locs)))
-        for index in range(arr2.shape[0]):
-            x = arr2[index, locs[0]] * np.cos(arr2[index, locs[1]])
-            y = arr2[index, locs[0]] * np.sin(arr2[index, locs[1]])
-            outArray = np.append(outArray, np.array([x, y]).reshape((1, 2)), axis=0)
-        return outArray[1:, :]
-    '''
-    Main plotting method that creates, saves, and displays plots of provided data
-    ***Restricted to 2D plots at the moment***
-    ################################################################################
-    allData -> A list containing at index [0] the names of each data field, and at
-        index [1] a 2D Array of all associated values of those "timesteps" data
-        fields; rows = values for each timestep, columns = values for each field
-        therein
-    shouldParameterize -> Should we make a parametric plot, or plot each field
-        separately?
-    shouldShow -> Should we immediately display the created plots?
-    shouldSave -> Should we save the created plots?
-    filename -> If shouldSave is True, then the created plots will go here.
-    plotTitle -> Title of the plot to be created
-    timeUnits -> Units for the x or "timestep" axis if shouldParameterize is False
-    labels -> List of value-field axis labels, defaults to basic alphabetical
-    yUnits -> List of corresponding units for those labels, defaults to "meters"
-    paramUnits -> List of axis units to use for a parameterized plot
-    dataNames -> List of header names that the conversion will use to map data;
-        identifies the appropriate column in fullArray
-    conversion -> If shouldParameterize is True, this is the mapping between the R^N
-        "time" and value fields and the R^2 x, y Cartesian coordinates we'll plot
-        with; like the ODE equations is a method defined somewhere else, passed
-        "by reference." Defaults to truncation of 2+N value fields, passing the
-        first two non-timestep fields as x and y directly.
-    ################################################################################
-    Return True -> Returns true if the plotting, saving, and/or displaying succeeded
-    '''
+    def paramConversion(self,arr2, locs, out=None):
+        return polarToCartesian(arr2, locs, out)
 
     def ehcircle(self,m=1): #makes a circle at the Schwarzschild radius for visualization purposes
         iconds = [2*m,0,0,np.pi/200] #r=2m, phi = 0, dr/dt = 0, frequency = whatever makes it smooth and a full circle
@@ -281,167 +1243,25 @@ class Simulator():
                 )
         return None
 
-    def plotSolData(self,allData, shouldParameterize, shouldShow, shouldSave,
-     filename = "defaultFilename.png",
-     plotTitle = "Output",
-     timeUnits="seconds",
-     labels=[chr(i) for i in range(97,123,1)],
-     yUnits=[None],
-     paramUnits = ["meters", "meters"],
-     dataNames=["x", "y"],
-     conversion=defaultConversion,
-     showEH=True):
-
-        names = allData[0]
-        fullArray = allData[1]
-
-        #Grab the timesteps into their own array for convenient access later
-        tSteps = fullArray[:, 0]
-
-        #If we should make a parametric plot
-        if shouldParameterize:
-
-            fig, ax = plt.subplots(figsize=(5,5))
-            ax.set_aspect(1)
-
-            #Find the column location in fullArray of the data we want to use
-            locs = [names.index(name) for name in dataNames]
-            #Get the x and y arrays using our specified conversion by passing
-            #the "coordinate" value fields into it, effectively transforming our
-            #data into a path in Cartesian coordinates
-            out = conversion(fullArray[:, :], locs)
-            x = out[:, 0]
-            y = out[:, 1]
-            #Title the plot
-            ax.set_title(plotTitle)
-            #Label the x and y axes "x (units)", "y (units)"
-            ax.set_xlabel("x (" + paramUnits[0] + ")")
-            ax.set_ylabel("y (" + paramUnits[1] + ")")
-            #Plot the x values versus the y values, which will implicitly be parametric
-            ax.plot(x, y)
-
-            if showEH:
-                circle = pch.Circle((0,0),radius=2,color='black')
-                ax.add_patch(circle)
-
-                """
-                #me overthinking things
-                try:
-                    circledata = self.readSolData("EHcircle.dat")
-                except:
-                    self.ehcircle()
-                    circledata = self.readSolData("EHcircle.dat")
-                circleArray = circledata[1]
-                circleout = self.paramConversion(circleArray[:,:],[1,2])
-                xc = circleout[:,0]
-                yc = circleout[:,1]
-                plt.plot(xc,yc)
-                """
-        #If we're not making parametric plots
-        else:
-            #Get the size of the "coordinate" fields in the input array
-            n = fullArray.shape[1] - 1
-            #Title the overall plot
-            
-            fig = plt.figure(figsize=(6,8))
-            #Generate default unit labels for each axis if none were given
-            if yUnits[0] == None:
-                yUnits = ["meters" for i in range(n)]
-            #For each coordinate field, we will make additional subplots which will
-            #automatically be composited into a single larger one for ease of
-            #saving and display
-            for axis in range(1,n+1):
-                #Make a new subplot in the (n, 1) grid (e.g., successive axes will
-                #move downwards)
-                ax = fig.add_subplot(n, 1, axis)
-                #Label the x-axis as time
-                ax.set_xlabel(u'\u03C4' +  " (" + timeUnits + ")")
-                #and the y-axis as whatever the name of the coordinate is
-                if yUnits[axis] != "":
-                    ax.set_ylabel(labels[axis] + " (" + yUnits[axis] + ")")
-                else:
-                    ax.set_ylabel(labels[axis])
-                #Then plot it with x using the timestep data and y using the
-                #coordinate data for that axis
-                ax.plot(tSteps, fullArray[:, axis])
-                #set a title, but only for the first plot; hacky, but w/e
-                if axis == 1:    
-                    ax.set_title(plotTitle)
-                
-            #Space out axes at the end so the x-labels don't overlap with the graph below
-            fig.subplots_adjust(hspace=1)
-            
-        #If we should save the plot, write the resulting plot to the given filename
-        if shouldSave:
-            plt.savefig(filename)
-        #If we should show the plot, display it
-        if shouldShow:
-            plt.show()
-
-        #Return True if plot generation was successful
-        return True
-
-    def makeAnimation(self,
-        allData,
-        shouldShow,
-        shouldSave,
-        dataNames=["x", "y"],
-        conversion=defaultConversion,
-        paramUnits = ["meters", "meters"],
-        filename = 'defaultFilename.gif',
-        animTitle = "Output",
-        boundScale = 1.3,
-        animSpeed = 1,
-        frameSlice = 10
-        ):
-
-        names = allData[0]
-        fullArray = allData[1]
-
-        tSteps = fullArray[:, 0].flatten()
-
-        fig, ax = plt.subplots(figsize=(5, 5))
-        ax.set_aspect(1)
-
-        locs = [names.index(name) for name in dataNames]
-        out = conversion(fullArray[:, :], locs)
-
-        ax.set_xlabel("x" + "(" + paramUnits[0]  + ")")
-        ax.set_ylabel("y" + "(" + paramUnits[1] +  ")")
-
-        x = out[:, 0].flatten()
-        y = out[:, 1].flatten()
-
-        xMin = boundScale * np.amin(x)
-        xMax = boundScale * np.amax(x)
-
-        yMin = boundScale * np.amin(y)
-        yMax = boundScale * np.amax(y)
-
-        ax.set(xlim=(xMin, xMax), ylim=(yMin, yMax))
-
-        circle = pch.Circle((0,0),radius=2,color='black')
-        ax.add_patch(circle)
-
-        line = ax.plot(x[0], y[0], color='b', lw=2)[0]
-
-        anim = FuncAnimation(
-        fig,
-        lambda i: line.set_data(x[:i:frameSlice], y[:i:frameSlice]),
-        frames=len(x)-1
-        )
-
-        if shouldShow:
-            plt.show()
-
-        if shouldSave:
-            #Framerate of produced gif is ~1/10 the fps actually specified,
-            #no idea why; optimizing for 60 Hz display
-            anim.save(filename, writer="pillow", fps=600)
-
-        print("Animation Complete")
+    '''
+    Plots solution data; see Plotting.plotSolData() for the arguments
+    ################################################################################
+    '''
+    def plotSolData(self,allData, shouldParameterize, shouldShow, shouldSave, **kwargs):
+        from Plotting import plotSolData
+        kwargs.setdefault("metrics", self.metrics)
+        with self.stage("plot"):
+            return plotSolData(allData, shouldParameterize, shouldShow, shouldSave,
+                **kwargs)
 
-        return True
+    '''
+    Animates solution data; see Plotting.makeAnimation() for the arguments
+    ################################################################################
+    '''
+    def makeAnimation(self,allData, shouldShow, shouldSave, **kwargs):
+        from Plotting import makeAnimation
+        kwargs.setdefault("metrics", self.metrics)
+        return makeAnimation(allData, shouldShow, shouldSave, **kwargs)
 
 ################################################################################
 # For command-line interaction (entry into the program is below)
@@ -0,0 +1,197 @@
+import numpy as np
+from Conversions import polarToCartesian
+
+################################################################################
+# Consumers for Simulator.streamSolData(). Each one looks at a chunk of a run as
+# it goes by and keeps only what it needs, so runs far longer than fit in memory
+# can still be written out, thinned down or summarized:
+#
+#   consume(tau, rVals) -> Called with every chunk, in order
+#   finish()            -> Called once the stream ends; returns the result
+#
+# runStream() drives any number of them from one stream, e.g.
+#   stream = sim.streamSolData(initConds, 1e7, 0.25, sim.Schwarzschild)
+#   rows, periapses = runStream(stream, [ChunkWriter(sim, "long.trj", names),
+#       PeriapsisDetector()])
+################################################################################
+
+
+'''
+Feeds every chunk of a stream to every consumer
+################################################################################
+stream -> Iterable of [tau, rVals] chunks, e.g. from Simulator.streamSolData()
+consumers -> List of consumers
+################################################################################
+Return results -> List of what each consumer's finish() returned
+'''
+def runStream(stream, consumers):
+    for tau, rVals in stream:
+        for consumer in consumers:
+            consumer.consume(tau, rVals)
+    return [consumer.finish() for consumer in consumers]
+
+
+class ChunkWriter():
+
+    '''
+    Writes a stream to a CSV or binary trajectory file as it arrives
+    ################################################################################
+    sim -> Simulator to write with
+    filename -> File to write (cleared when the first chunk arrives)
+    axisNames -> Names of tau and each solution column
+    precision -> Significant digits per value, for CSV files
+    metadata -> Run information for the header of binary files
+    capacity -> Rows to reserve up front in binary files, e.g. the run's total
+        row count, to avoid regrowing the file as it fills
+    ################################################################################
+    '''
+    def __init__(self, sim, filename, axisNames, precision=None, metadata=None,
+        capacity=None):
+        self.sim = sim
+        self.filename = filename
+        self.axisNames = axisNames
+        self.precision = precision
+        self.metadata = metadata
+        self.capacity = capacity
+        self.rows = 0
+
+    def consume(self, tau, rVals):
+        self.sim.writeSolArray(self.filename, tau, rVals, self.axisNames,
+            precision=self.precision, metadata=self.metadata,
+            capacity=self.capacity, append=self.rows > 0)
+        self.rows += rVals.shape[0]
+
+    '''
+    Return rows -> Number of rows written
+    '''
+    def finish(self):
+        return self.rows
+
+
+class Decimator():
+
+    '''
+    Keeps every n-th row of a stream (plus the last one), e.g. for plotting a run
+    too long to plot in full
+    ################################################################################
+    every -> Spacing of the rows kept
+    ################################################################################
+    '''
+    def __init__(self, every):
+        self.every = int(every)
+        self.seen = 0
+        self.taus = []
+        self.rows = []
+        self.last = None
+
+    def consume(self, tau, rVals):
+        #Index (within this chunk) of the first row on the every-n grid
+        offset = (-self.seen) % self.every
+        self.taus.append(tau[offset::self.every].copy())
+        self.rows.append(rVals[offset::self.every].copy())
+        self.seen += rVals.shape[0]
+        self.last = [tau[-1], rVals[-1].copy()]
+
+    '''
+    Return [tau, rVals] -> The kept rows, as for a single chunk
+    '''
+    def finish(self):
+        if self.last is None:
+            return [np.empty(0), np.empty((0, 0))]
+        tau = np.concatenate(self.taus)
+        rVals = np.concatenate(self.rows)
+        if (self.seen - 1) % self.every != 0:
+            tau = np.append(tau, self.last[0])
+            rVals = np.vstack([rVals, self.last[1]])
+        return [tau, rVals]
+
+
+class PeriapsisDetector():
+
+    '''
+    Finds every periapsis passage in a stream (dr/dtau going from negative to
+    positive), placing each one by linear interpolation between the rows
+    either side, including across chunk boundaries
+    ################################################################################
+    rCol, phiCol, vCol -> Columns of r, phi and dr/dtau in the solution rows
+        (default to the Schwarzschild() layout)
+    ################################################################################
+    '''
+    def __init__(self, rCol=0, phiCol=1, vCol=3):
+        self.cols = [rCol, phiCol, vCol]
+        self.previous = None
+        self.found = []
+
+    def consume(self, tau, rVals):
+        rCol, phiCol, vCol = self.cols
+        taus = tau
+        r = rVals[:, rCol]
+        phi = rVals[:, phiCol]
+        v = rVals[:, vCol]
+        if self.previous is not None:
+            taus = np.concatenate([[self.previous[0]], taus])
+            r = np.concatenate([[self.previous[1]], r])
+            phi = np.concatenate([[self.previous[2]], phi])
+            v = np.concatenate([[self.previous[3]], v])
+        crossings = np.flatnonzero((v[:-1] < 0) & (v[1:] >= 0))
+        if crossings.shape[0]:
+            weight = -v[crossings]/(v[crossings + 1] - v[crossings])
+            found = np.empty((crossings.shape[0], 3))
+            for col, values in enumerate([taus, r, phi]):
+                found[:, col] = values[crossings] + weight*(values[crossings + 1] - values[crossings])
+            self.found.append(found)
+        self.previous = [taus[-1], r[-1], phi[-1], v[-1]]
+
+    '''
+    Return periapses -> (K, 3) array of [tau, r, phi] at each periapsis; the
+        precession per orbit is np.diff(periapses[:, 2]) - 2 pi
+    '''
+    def finish(self):
+        if not self.found:
+            return np.empty((0, 3))
+        return np.concatenate(self.found)
+
+
+class LivePlot():
+
+    '''
+    Draws a stream onto a matplotlib line as it arrives, thinned out so the
+    line never grows past a fixed number of points
+    ################################################################################
+    line -> matplotlib Line2D to draw on (its axes are rescaled as it grows)
+    conversion -> Mapping from solution rows to x, y, as for plotSolData()
+    locs -> Columns of the solution rows handed to conversion
+    maxPoints -> Most points kept on the line; every time it fills up, every
+        other point is dropped and new points are kept half as often
+    ################################################################################
+    '''
+    def __init__(self, line, conversion=polarToCartesian, locs=[0, 1],
+        maxPoints=20000):
+        self.line = line
+        self.conversion = conversion
+        self.locs = locs
+        self.maxPoints = maxPoints
+        self.every = 1
+        self.seen = 0
+        self.points = np.empty((0, 2))
+
+    def consume(self, tau, rVals):
+        offset = (-self.seen) % self.every
+        self.seen += rVals.shape[0]
+        newPoints = self.conversion(rVals[offset::self.every], self.locs)
+        self.points = np.vstack([self.points, newPoints])
+        while self.points.shape[0] > self.maxPoints:
+            self.points = self.points[::2]
+            self.every *= 2
+
+        self.line.set_data(self.points[:, 0], self.points[:, 1])
+        self.line.axes.relim()
+        self.line.axes.autoscale_view()
+        self.line.figure.canvas.draw_idle()
+        self.line.figure.canvas.flush_events()
+
+    '''
+    Return points -> (n, 2) array of the points on the line
+    '''
+    def finish(self):
+        return self.points
@@ -0,0 +1,223 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from Solver import Simulator, ORBIT_BOUND, ORBIT_PLUNGE, ORBIT_CLASS_NAMES
+
+#Column layout of the per-point summary array produced by a sweep
+SWEEP_FIELDS = ["e", "l", "r_i", "pos", "class", "periapsis", "apoapsis",
+    "precession", "tauHorizon"]
+
+DEFAULT_SWEEP_TAU = 10000
+DEFAULT_SWEEP_CHUNK = 256
+
+
+'''
+Integrates a plunging orbit until it reaches the horizon
+################################################################################
+sim -> Simulator to integrate with
+point -> [e, l, r_i, pos] describing the launch; pos is 1 for an outgoing and 0
+    for an incoming launch, as in initcondgen()
+tauMax -> Longest proper time span to integrate over
+m -> Mass of the central body
+################################################################################
+Return tau -> Proper time at which the horizon was reached (NaN if it was not
+    reached within tauMax)
+'''
+def horizonTime(sim, point, tauMax, m=1):
+    e, l, r_i, pos = point
+    initialConditions = sim.initcondgen(e, l, r_i, 0, bool(pos), m=m)
+    #Only the events are needed, so skip dense output of the trajectory
+    sol, events = sim.getSolDataEvents(
+        initialConditions,
+        np.array([0, tauMax]),
+        sim.Schwarzschild,
+        m=m
+        )
+    for event in events:
+        if event["type"] == "horizon":
+            return event["tau"]
+    return np.nan
+
+'''
+Worker entry point for ParameterSweep.run(); integrates one chunk of plunging
+orbits (module level so it can be handed to a process pool)
+################################################################################
+args -> (points, tauMax, m, cache), cache being a ResultCache or None
+################################################################################
+Return taus -> Proper time to the horizon of each point in the chunk
+'''
+def sweepChunk(args):
+    points, tauMax, m, cache = args
+    sim = Simulator(cache=cache)
+    return np.array([horizonTime(sim, point, tauMax, m) for point in points])
+
+
+class ParameterSweep():
+
+    '''
+    Sets up a sweep over launch parameters
+    ################################################################################
+    points -> (N, 4) array of [e, l, r_i, pos] rows, e.g. from makeGrid()
+    shape -> Shape to fold the N points back into for heat maps (defaults to a
+        flat list)
+    tauMax -> Longest proper time span a plunging orbit is integrated over
+    m -> Mass of the central body
+    cache -> Optional ResultCache; plunges already integrated by an earlier
+        sweep (or run) over the same points are read back instead of solved
+    ################################################################################
+    '''
+    def __init__(self, points, shape=None, tauMax=DEFAULT_SWEEP_TAU, m=1, cache=None):
+        self.points = np.atleast_2d(np.asarray(points, dtype=float))
+        self.shape = (self.points.shape[0],) if shape is None else tuple(shape)
+        self.tauMax = tauMax
+        self.m = m
+        self.cache = cache
+        self.results = None
+
+    '''
+    Builds a sweep over the full grid of the given parameter values
+    ################################################################################
+    eVals, lVals -> 1D arrays of energies and angular momenta
+    r_i -> Launch radius, either a scalar or a 1D array of radii
+    pos -> Launch direction (True for outgoing), either a bool or a 1D array
+    **kwargs -> Passed on to ParameterSweep()
+    ################################################################################
+    Return sweep -> A ParameterSweep whose shape has one axis per parameter
+        that was given as an array (in the order r_i, pos, l, e)
+    '''
+    @classmethod
+    def makeGrid(cls, eVals, lVals, r_i, pos=False, **kwargs):
+        axes = [np.atleast_1d(r_i), np.atleast_1d(pos).astype(float),
+            np.atleast_1d(lVals), np.atleast_1d(eVals)]
+        R, P, L, E = np.meshgrid(*axes, indexing='ij')
+        points = np.stack([E.ravel(), L.ravel(), R.ravel(), P.ravel()], axis=1)
+        shape = tuple(len(axis) for axis in axes if len(axis) > 1)
+        return cls(points, shape=shape, **kwargs)
+
+    '''
+    Summarizes every point. Classes, turning points and precession all come
+    straight from Simulator.classifyOrbit() and Simulator.precessionAngle();
+    only plunging orbits are integrated (for their proper time to the horizon),
+    in chunks spread over a process pool
+    ################################################################################
+    workers -> Number of worker processes (defaults to the number of CPUs)
+    chunkSize -> Number of plunging orbits handed to a worker at a time
+    ################################################################################
+    Return results -> (N, len(SWEEP_FIELDS)) summary array, also kept as
+        self.results
+    '''
+    def run(self, workers=None, chunkSize=DEFAULT_SWEEP_CHUNK):
+        sim = Simulator()
+        e, l, r_i, pos = self.points.T
+
+        results = np.full((self.points.shape[0], len(SWEEP_FIELDS)), np.nan)
+        results[:, :4] = self.points
+        info = sim.classifyOrbit(e, l, r_i, pos > 0, m=self.m)
+        results[:, 4] = info["class"]
+        results[:, 5] = info["periapsis"]
+        results[:, 6] = info["apoapsis"]
+        bound = info["class"] == ORBIT_BOUND
+        results[bound, 7] = sim.precessionAngle(e[bound], l[bound], m=self.m)
+
+        plunging = np.flatnonzero(info["class"] == ORBIT_PLUNGE)
+        chunks = [
+            (self.points[plunging[start:start + chunkSize]], self.tauMax, self.m,
+                self.cache)
+            for start in range(0, plunging.shape[0], chunkSize)
+            ]
+        if workers == 1:
+            taus = [sweepChunk(chunk) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                taus = list(pool.map(sweepChunk, chunks))
+        if taus:
+            results[plunging, 8] = np.concatenate(taus)
+
+        self.results = results
+        return self.results
+
+    '''
+    Writes the summary to a single compressed .npz file
+    ################################################################################
+    filename -> File to write to
+    ################################################################################
+    Return True -> Returns true if writing was successful
+    '''
+    def save(self, filename):
+        np.savez_compressed(
+            filename,
+            results=self.results,
+            fields=np.array(SWEEP_FIELDS),
+            shape=np.array(self.shape)
+            )
+        return True
+
+    '''
+    Reads a summary back from a file written by save()
+    ################################################################################
+    filename -> File to read from
+    ################################################################################
+    Return sweep -> A ParameterSweep with its results filled in
+    '''
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            sweep = cls(data["results"][:, :4], shape=data["shape"])
+            sweep.results = data["results"]
+        return sweep
+
+    '''
+    Returns one field of the summary folded back into the sweep's shape
+    ################################################################################
+    field -> Name of the field, one of SWEEP_FIELDS
+    ################################################################################
+    '''
+    def getField(self, field):
+        return self.results[:, SWEEP_FIELDS.index(field)].reshape(self.shape)
+
+    '''
+    Renders a heat map of one summary field over the (e, l) plane; requires a
+    sweep made by makeGrid() with only e and l varying
+    ################################################################################
+    field -> Name of the field to map; "class" is drawn with a discrete legend
+    shouldShow -> Should we immediately display the map?
+    shouldSave -> Should we save the map?
+    filename -> If shouldSave is True, then the map will go here
+    plotTitle -> Title of the map
+    ################################################################################
+    Return True -> Returns true if the map was made successfully
+    '''
+    def plotMap(self, field, shouldShow, shouldSave,
+        filename="defaultSweep.png",
+        plotTitle="Sweep"):
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import ListedColormap
+
+        values = self.getField(field)
+        eVals = self.getField("e")
+        lVals = self.getField("l")
+        extent = [eVals.min(), eVals.max(), lVals.min(), lVals.max()]
+
+        fig, ax = plt.subplots(figsize=(6, 5))
+        ax.set_title(plotTitle)
+        ax.set_xlabel("e")
+        ax.set_ylabel(u'ℓ' + " (M)")
+
+        if field == "class":
+            cmap = ListedColormap(["tab:blue", "black", "tab:orange", "lightgrey"])
+            image = ax.imshow(values, origin='lower', extent=extent, aspect='auto',
+                cmap=cmap, vmin=-0.5, vmax=len(ORBIT_CLASS_NAMES) - 0.5,
+                interpolation='nearest')
+            bar = fig.colorbar(image, ax=ax, ticks=range(len(ORBIT_CLASS_NAMES)))
+            bar.ax.set_yticklabels(ORBIT_CLASS_NAMES)
+        else:
+            image = ax.imshow(values, origin='lower', extent=extent, aspect='auto',
+                interpolation='nearest')
+            fig.colorbar(image, ax=ax, label=field)
+
+        if shouldSave:
+            fig.savefig(filename)
+        if shouldShow:
+            plt.show()
+        plt.close(fig)
+
+        return True
@@ -0,0 +1,226 @@
+import numpy as np
+import json
+import os
+import sys
+
+################################################################################
+# Binary columnar trajectory files (.trj)
+#
+# Layout:
+#   8 bytes   magic string TRAJECTORY_MAGIC
+#   8 bytes   little-endian uint64 length of the JSON header that follows
+#   n bytes   JSON header (space padded), see writeTrajectory()
+#   data      one contiguous little-endian float64 block per field, each
+#             "capacity" rows long, starting at header["dataOffset"]
+#
+# Keeping every field contiguous lets readers memory-map the file and touch
+# only the columns they actually use.
+################################################################################
+
+TRAJECTORY_EXTENSION = ".trj"
+TRAJECTORY_MAGIC = b"PRECTRJ1"
+TRAJECTORY_DTYPE = "<f8"
+#Data blocks start on a page boundary so memory maps line up
+TRAJECTORY_ALIGN = 4096
+
+
+'''
+Checks whether a file name refers to a binary trajectory file
+################################################################################
+filename -> Name of the file
+################################################################################
+'''
+def isTrajectoryFile(filename):
+    return os.path.splitext(str(filename))[1].lower() == TRAJECTORY_EXTENSION
+
+
+'''
+Summarizes an independent variable grid for the header, so it can be described
+without storing it twice
+################################################################################
+indVals -> 1D array of independent variable values
+################################################################################
+Return grid -> dict with "start", "stop", "count" and whether the grid is
+    "uniform"
+'''
+def describeGrid(indVals):
+    indVals = np.asarray(indVals, dtype=float)
+    if indVals.shape[0] == 0:
+        return {"start":None, "stop":None, "count":0, "uniform":True}
+    steps = np.diff(indVals)
+    uniform = bool(steps.shape[0] == 0 or np.allclose(steps, steps[0]))
+    return {
+        "start":float(indVals[0]),
+        "stop":float(indVals[-1]),
+        "count":int(indVals.shape[0]),
+        "uniform":uniform
+    }
+
+
+'''
+Reads the JSON header of a binary trajectory file
+################################################################################
+filename -> File to read from
+################################################################################
+Return header -> The decoded header dict
+'''
+def readTrajectoryHeader(filename):
+    with open(filename, 'rb') as file:
+        if file.read(len(TRAJECTORY_MAGIC)) != TRAJECTORY_MAGIC:
+            raise ValueError(str(filename) + " is not a trajectory file")
+        length = int(np.frombuffer(file.read(8), dtype="<u8")[0])
+        return json.loads(file.read(length).decode("utf-8"))
+
+
+'''
+Writes the header block of a binary trajectory file, leaving room for it to
+grow when the file is later updated in place
+################################################################################
+file -> File object opened for binary writing, positioned at the start
+header -> Header dict; its "dataOffset" is filled in here
+################################################################################
+'''
+def writeTrajectoryHeader(file, header):
+    encoded = json.dumps(header).encode("utf-8")
+    if "dataOffset" not in header:
+        reserved = len(TRAJECTORY_MAGIC) + 8 + len(encoded) + 1024
+        header["dataOffset"] = int(np.ceil(reserved/TRAJECTORY_ALIGN)*TRAJECTORY_ALIGN)
+        encoded = json.dumps(header).encode("utf-8")
+    space = header["dataOffset"] - len(TRAJECTORY_MAGIC) - 8
+    if len(encoded) > space:
+        raise ValueError("Trajectory header no longer fits in its reserved space")
+    file.write(TRAJECTORY_MAGIC)
+    file.write(np.array([space], dtype="<u8").tobytes())
+    file.write(encoded.ljust(space))
+
+
+'''
+Writes a solution to a binary trajectory file
+################################################################################
+filename -> Name of file to put the data in (cleared when accessed)
+indVals -> Independent variable values, stored as the first field; only the
+    first len(rVals) are used
+rVals -> 2D (T, V) array of solution values
+axisNames -> List of V + 1 field names
+metadata -> Optional dict of extra information to keep in the header (e.g.
+    initial conditions and mass)
+capacity -> Number of rows to reserve per field; defaults to exactly T
+################################################################################
+Return True -> Returns true if writing was successful
+'''
+def writeTrajectory(filename, indVals, rVals, axisNames, metadata=None, capacity=None):
+    steps, vals = rVals.shape
+    indVals = np.asarray(indVals, dtype=float)[:steps]
+    capacity = steps if capacity is None else max(int(capacity), steps)
+
+    header = {
+        "fields":list(axisNames[:vals + 1]),
+        "rows":int(steps),
+        "capacity":int(capacity),
+        "dtype":TRAJECTORY_DTYPE,
+        "grid":describeGrid(indVals),
+        "metadata":{} if metadata is None else metadata
+    }
+
+    with open(filename, 'wb') as file:
+        writeTrajectoryHeader(file, header)
+        padding = np.zeros(capacity - steps, dtype=TRAJECTORY_DTYPE).tobytes()
+        file.write(indVals.astype(TRAJECTORY_DTYPE).tobytes())
+        file.write(padding)
+        for valIndex in range(vals):
+            file.write(np.ascontiguousarray(rVals[:, valIndex], dtype=TRAJECTORY_DTYPE).tobytes())
+            file.write(padding)
+    return True
+
+
+'''
+Appends rows to a binary trajectory file in place, growing the file first if
+its reserved capacity is used up; the header's row count is only updated once
+the new data is on disk, so a crash part way leaves the file as it was
+################################################################################
+filename -> File to append to
+indVals -> Independent variable values of the new rows; only the first
+    len(rVals) are used
+rVals -> 2D (T, V) array of new solution values
+################################################################################
+Return rows -> Number of rows in the file afterwards
+'''
+def appendTrajectory(filename, indVals, rVals):
+    info = readTrajectoryHeader(filename)
+    steps = rVals.shape[0]
+    rows = info["rows"]
+    if rows + steps > info["capacity"]:
+        #Double the capacity, so a run appended to piece by piece is only
+        #copied a handful of times
+        growTrajectory(filename, max(2*info["capacity"], rows + steps))
+        info = readTrajectoryHeader(filename)
+
+    block = np.memmap(filename, dtype=info["dtype"], mode='r+',
+        offset=info["dataOffset"], shape=(len(info["fields"]), info["capacity"]))
+    block[0, rows:rows + steps] = np.asarray(indVals, dtype=float)[:steps]
+    block[1:, rows:rows + steps] = rVals.T
+    block.flush()
+    info["rows"] = rows + steps
+    info["grid"] = describeGrid(block[0, :rows + steps])
+    del block
+
+    with open(filename, 'r+b') as file:
+        writeTrajectoryHeader(file, info)
+    return info["rows"]
+
+
+'''
+Rewrites a binary trajectory file with room for more rows; the new file
+replaces the old one only once it has been written completely
+################################################################################
+filename -> File to grow
+capacity -> New number of rows to reserve per field
+################################################################################
+Return True -> Returns true if the file was rewritten
+'''
+def growTrajectory(filename, capacity):
+    fields, dOut, info = readTrajectory(filename)
+    tempName = filename + ".grow"
+    writeTrajectory(tempName, dOut[:, 0], dOut[:, 1:], fields, info["metadata"],
+        capacity=capacity)
+    del dOut
+    os.replace(tempName, filename)
+    return True
+
+
+'''
+Opens a binary trajectory file without reading it into memory
+################################################################################
+filename -> File to read from
+columns -> Optional list of fields to read, by name or index; only those fields
+    are touched (and copied out of the map). Defaults to every field, returned
+    as a zero-copy view of the map
+mode -> Memory-map mode, 'r' for read only or 'r+' to allow editing in place
+################################################################################
+Return [header, dOut, info] -> Field names, a (T, V) array of the data (column
+    major, so each field is contiguous) and the full header dict
+'''
+def readTrajectory(filename, columns=None, mode='r'):
+    info = readTrajectoryHeader(filename)
+    fields = info["fields"]
+    block = np.memmap(filename, dtype=info["dtype"], mode=mode,
+        offset=info["dataOffset"], shape=(len(fields), info["capacity"]))
+    if columns is None:
+        return [list(fields), block[:, :info["rows"]].T, info]
+    usecols = [fields.index(col) if isinstance(col, str) else col for col in columns]
+    dOut = np.empty((info["rows"], len(usecols)), order='F')
+    for outIndex, col in enumerate(usecols):
+        dOut[:, outIndex] = block[col, :info["rows"]]
+    return [[fields[col] for col in usecols], dOut, info]
+
+
+################################################################################
+# For command-line use: python Trajectory.py file1.dat file2.dat ...
+# converts each CSV data file to a .trj file alongside it
+################################################################################
+if __name__ == "__main__":
+    from Solver import Simulator
+    converter = Simulator()
+    for path in sys.argv[1:]:
+        newPath = converter.convertSolData(path)
+        print(path + " -> " + newPath)
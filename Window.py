@@ -4,7 +4,10 @@ from tkinter import filedialog
 import tkinter.ttk as ttk
 import tkinter.font as tkFont
 from PIL import ImageTk, Image
-from Solver import Simulator
+from Solver import Simulator, ORBIT_FORBIDDEN
+from FrameProvider import FrameProvider
+from Runner import RunQueue, runStopConditions
+from Metrics import formatRecord, writeRecord
 import os
 import errno
 
@@ -23,12 +26,17 @@ DEFAULT_DATA_SAVE_DIR = "Output\\Simulation_Data\\"
 DEFAULT_COMP_SAVE_DIR = "Output\\Component_Plots\\"
 DEFAULT_PARAM_SAVE_DIR = "Output\\Parametric_Plots\\"
 DEFAULT_ANIM_SAVE_DIR = "Output\\Animations\\"
+#Solutions of earlier runs, reused when a run is repeated
+DEFAULT_CACHE_DIR = "Output\\Cache\\"
+#Every finished run's timings and counts, one JSON record per line
+DEFAULT_METRICS_FILE = "Output\\run_metrics.jsonl"
 
 DEFAULT_SAVE_DIRS = {
     "data":DEFAULT_DATA_SAVE_DIR,
     "compPlot":DEFAULT_COMP_SAVE_DIR,
     "paramPlot":DEFAULT_PARAM_SAVE_DIR,
-    "anim":DEFAULT_ANIM_SAVE_DIR
+    "anim":DEFAULT_ANIM_SAVE_DIR,
+    "cache":DEFAULT_CACHE_DIR
 }
 
 DEFAULT_SIM_DELTA_TIME = 0.25
@@ -48,7 +56,7 @@ class Application(tk.Frame):
 
         self.isAnimLoaded = False
         self.animFrameNumber = -1
-        self.allAnimFrames = []
+        self.frameProvider = None
         self.isPlaying = False
         self.currentFrame = 0
 
@@ -61,6 +69,7 @@ class Application(tk.Frame):
         self.s2 = tk.IntVar(value=0)
         self.s3 = tk.IntVar(value=0)
         self.s4 = tk.IntVar(value=0)
+        self.showMetrics = tk.IntVar(value=0)
 
 
         self.fileNameToSave = tk.StringVar(value="Valid Filename")
@@ -110,6 +119,12 @@ class Application(tk.Frame):
 
         self.workDone = tk.IntVar(value=0)
 
+        #Runs are carried out one after another in a separate process; their
+        #progress comes back through update()
+        self.runQueue = RunQueue(onProgress=self.showRunProgress,
+            onFinished=self.finishRun)
+        self.progress = None
+
         realPath = grabTruePath(DEFAULT_OUT_DIR)
 
         if not os.path.isdir(realPath):
@@ -127,6 +142,8 @@ class Application(tk.Frame):
                     raise
 
         self.master = master
+        #Run processes aren't daemons, so stop them before the window goes
+        self.master.protocol("WM_DELETE_WINDOW", self.quitApp)
         self.pack()
         self.configStyles()
         self.createWidgets()
@@ -219,7 +236,7 @@ class Application(tk.Frame):
     def animRestart(self):
         self.currentFrame = 0
         self.gifScale.set(self.currentFrame)
-        self.setLabelFrame(0, self.allAnimFrames, self.animFrameNumber)
+        self.setLabelFrame(0)
         return
 
     #Pauses or plays animation from last pause point depending on previous state
@@ -237,47 +254,26 @@ class Application(tk.Frame):
         finalFrameNum = self.animFrameNumber - 1
         self.currentFrame = finalFrameNum
         self.gifScale.set(self.currentFrame)
-        self.setLabelFrame(finalFrameNum, self.allAnimFrames, self.animFrameNumber)
+        self.setLabelFrame(finalFrameNum)
         return
 
 
-    def getAnimFrameLength(self, animFilePath):
-        im = Image.open(animFilePath)
-        frameNum = 0
-        while True:
-            try:
-                im.seek(frameNum)
-            except EOFError:
-                break
-            frameNum += 1
-        return frameNum
-
-    def reconstructGif(self, animFilePath, frameNumber):
-        baseFrame = Image.open(animFilePath)
-        baseFrame.seek(0)
-        firstFrame = baseFrame
-        allFrames = [firstFrame]
-
-        lastFrame = firstFrame
-        sizeX, sizeY = lastFrame.size
-        frameBox = (0, 0, sizeX, sizeY)
-
-        for index in range(1,frameNumber):
-            baseFrame.seek(index)
-
-            newFrame = lastFrame
-            newFrame.paste(baseFrame, box=frameBox)
-
-            allFrames.append(newFrame.copy())
-            lastFrame = newFrame
-
-        return allFrames[1:]
+    #Shows one frame of the loaded animation; frames that haven't been indexed
+    #yet are skipped (the previous one stays up)
+    def setLabelFrame(self, frame):
+        if self.frameProvider is not None and frame < self.animFrameNumber:
+            im = self.frameProvider.getPhoto(frame)
+            if im is not None:
+                self.imagePanel["image"] = im
+                self.imagePanel.image = im
+                self.frameProvider.setPlayhead(frame)
+        return
 
-    def setLabelFrame(self, frame, allAnimFrames, animFrameNumber):
-        if frame < animFrameNumber:
-            im = ImageTk.PhotoImage(allAnimFrames[frame])
-            self.imagePanel["image"] = im
-            self.imagePanel.image = im
+    #Stops and drops the frame provider of the previously loaded animation
+    def unloadAnim(self):
+        if self.frameProvider is not None:
+            self.frameProvider.close()
+            self.frameProvider = None
         return
 
 
@@ -295,15 +291,16 @@ class Application(tk.Frame):
                 self.playButton.state(["!disabled"])
                 self.forwardButton.state(["!disabled"])
 
-                baseFrameNumber = self.getAnimFrameLength(filePath)
-
-                self.allAnimFrames = self.reconstructGif(filePath, baseFrameNumber)
-                self.animFrameNumber = baseFrameNumber - 1
+                #Frames are indexed in the background; update() keeps the
+                #scale's range in step as more of them become available
+                self.unloadAnim()
+                self.frameProvider = FrameProvider(filePath)
+                self.animFrameNumber = 1
 
 
                 self.gifScale.config(state="active", fg='white', bg='grey40',
-                    to=self.animFrameNumber)
-                self.setLabelFrame(0, self.allAnimFrames, self.animFrameNumber)
+                    to=0)
+                self.setLabelFrame(0)
 
 
             else:
@@ -319,6 +316,7 @@ class Application(tk.Frame):
 
 
                     self.animFrameNumber = -1
+                    self.unloadAnim()
 
                     img = ImageTk.PhotoImage(Image.open(filePath))
                     self.imagePanel["image"] = img
@@ -458,6 +456,19 @@ class Application(tk.Frame):
                 key2 = keysCase2[keyIndex]
                 if key2 != key1:
                     self.enterStructures[key2].config(style="Empty.TEntry")
+
+            #Reject launches inside the potential barrier before any solver
+            #time is spent on them
+            if self.validity["eVal"] and self.validity["lVal"] and self.validity["rValA"]:
+                orbitInfo = Simulator().classifyOrbit(
+                    float(self.eVal.get()),
+                    float(self.lVal.get()),
+                    float(self.rValA.get()),
+                    self.plusMinus.get() == 1
+                    )
+                if orbitInfo["class"] == ORBIT_FORBIDDEN:
+                    self.enterStructures["rValA"].config(style="Invalid.TEntry")
+                    areInputsValid = False
         else:
             for key in keysCase2:
                 if self.validity[key]:
@@ -656,6 +667,9 @@ class Application(tk.Frame):
         self.dispSel3["command"] = self.assessDisplayMode
         self.dispSel3.state(["disabled"])
 
+        self.metricsSel = ttk.Checkbutton(self.rConfig, variable=self.showMetrics, text="Show Run Metrics")
+        self.metricsSel.grid(row=14, column=5, columnspan=2, sticky='W', padx=pVal, pady=pVal)
+
         self.goButton = ttk.Button(self.rConfig, style="T.TButton")
         self.goButton["text"] = "Go"
         self.goButton["command"] = self.collectInputAndRun
@@ -685,25 +699,12 @@ class Application(tk.Frame):
         realPath = grabTruePath(DEFAULT_SAVE_DIRS[outType] + fileName)
         return realPath
 
+    #Reads the run configuration into a job and queues it; the run itself
+    #happens in another process (see Runner.py), so the window stays usable
     def collectInputAndRun(self):
         self.rConfig.destroy()
         #self.rConfig.grab_release()
 
-        self.progress = tk.Toplevel(takefocus=True)
-        self.progress.title("Run In Progress")
-        self.progress.grab_set()
-
-        self.updateLabel = ttk.Label(self.progress, text="Collecting...")
-        self.updateLabel.grid(row=0, column=0, sticky='W')
-
-        self.bar = ttk.Progressbar(self.progress, mode='determinate',
-            variable=self.workDone,
-            orient=tk.HORIZONTAL,
-            length=300)
-        self.bar.grid(row=1, column=0, sticky='W')
-
-
-
         plotBaseName = self.fileNameToSave.get()
         dataName = plotBaseName + "_Data.dat"
         compPlotName = plotBaseName + "_Comp.png"
@@ -720,9 +721,6 @@ class Application(tk.Frame):
 
         sim = Simulator()
 
-        self.updateLabel.config(text="Initializing Solver...")
-        self.workDone.set(10)
-
         initialConditions = []
 
         if self.inputMode.get() == 0:
@@ -751,156 +749,150 @@ class Application(tk.Frame):
 
             initialConditions = sim.initcondgen_ur_uw(ur, up, r_i, p_i)
 
-        self.updateLabel.config(text="Simulating...")
-        self.workDone.set(25)
-
-
-        fieldNames = ["tau","r","phi","dt/dtau","dr/dtau","dphi/dtau"]
-
-        sim.writeSolData(
-            dataOutPath,
-            initialConditions,
-            np.linspace(0, tSteps, int(tSteps/DEFAULT_SIM_DELTA_TIME)),
-            sim.Schwarzschild,
-            fieldNames
-            )
-
-        self.updateLabel.config(text="Generating Plots...")
-        self.workDone.set(50)
-
-
-        tauUCode = u'\u03C4'
-        phiUCode = u'\u03D5'
-        dphi_dt_String = "d" + phiUCode + "/" "d" + tauUCode
-
-        fNF = [
-            tauUCode,
-            'r',
-            phiUCode,
-            "dt/d" + tauUCode,
-            "dr/d " + tauUCode,
-            dphi_dt_String
-            ]
-
-        solData = sim.readSolData(dataOutPath)
-
-
-        if self.s1.get() == 0:
-            #Delete created data file
-            try:
-                os.remove(dataOutPath)
-            except OSError:
-                raise
-
-
-        if self.s2.get() == 1:
-            sim.plotSolData(
-                solData,
-                False,
-                False,
-                True,
-                filename=compOutPath,
-                plotTitle=plotBaseName,
-                timeUnits="M",
-                labels=fNF,
-                yUnits=['M', 'M', "rad", "", "", "rad/M"]
-            )
+        stopConditions = runStopConditions(sim, initialConditions)
+
+        job = {
+            "name":plotBaseName,
+            "initialConditions":[float(val) for val in initialConditions],
+            "tSteps":tSteps,
+            "deltaTime":DEFAULT_SIM_DELTA_TIME,
+            "stopConditions":stopConditions,
+            "paths":{
+                "data":dataOutPath,
+                "compPlot":compOutPath,
+                "paramPlot":paramOutPath,
+                "anim":animOutPath
+            },
+            "outputs":{
+                "data":self.s1.get() == 1,
+                "compPlot":self.s2.get() == 1,
+                "paramPlot":self.s3.get() == 1,
+                "anim":self.s4.get() == 1
+            },
+            "display":[None, "compPlot", "paramPlot", "anim"][self.displayMode.get() + 1],
+            "showMetrics":self.showMetrics.get() == 1,
+            "cacheDir":grabTruePath(DEFAULT_CACHE_DIR)
+        }
 
-        if self.s3.get() == 1:
-            solDatarray = solData[1]
-
-            plotData = [
-            [solData[0][0],
-            solData[0][1],
-            solData[0][4],
-            solData[0][2]
-            ],
-            np.concatenate((solDatarray[:,0:2],solDatarray[:,4:5],solDatarray[:,2:3]),axis=1)
-            ]
-
-            fieldNamesRearranged = [fNF[0] ,fNF[1], fNF[4], fNF[2]]
-
-
-            sim.plotSolData(
-                plotData,
-                True,
-                False,
-                True,
-                filename=paramOutPath,
-                plotTitle=plotBaseName,
-                paramUnits=["M", "M"],
-                dataNames=["r", "phi"],
-                conversion=sim.paramConversion
-            )
+        self.runQueue.submit(job)
+        self.displayProgress()
 
-        self.updateLabel.config(text="Animating (this may take a while)...")
-        self.workDone.set(75)
+        return
 
-        if self.s4.get() == 1:
-            solDatarray = solData[1]
-
-            plotData = [
-            [solData[0][0],
-            solData[0][1],
-            solData[0][4],
-            solData[0][2]
-            ],
-            np.concatenate((solDatarray[:,0:2],solDatarray[:,4:5],solDatarray[:,2:3]),axis=1)
-            ]
-
-            fieldNamesRearranged = [fNF[0] ,fNF[1], fNF[4], fNF[2]]
-
-            sim.makeAnimation(
-                plotData,
-                False,
-                True,
-                filename=animOutPath,
-                animTitle=plotBaseName,
-                dataNames=["r", "phi"],
-                paramUnits=["M","M"],
-                conversion=sim.paramConversion,
-                frameSlice=int(np.ceil((tSteps/DEFAULT_SIM_DELTA_TIME)/500))
-            )
+    #Creates the progress window if it isn't already up; it stays up until
+    #every queued run has finished
+    def displayProgress(self):
+        if self.progress is None:
+            self.progress = tk.Toplevel(takefocus=True)
+            self.progress.title("Run In Progress")
+            self.progress.protocol("WM_DELETE_WINDOW", self.cancelAllRuns)
+
+            self.updateLabel = ttk.Label(self.progress, text="Starting...")
+            self.updateLabel.grid(row=0, column=0, columnspan=2, sticky='W')
+
+            self.bar = ttk.Progressbar(self.progress, mode='determinate',
+                variable=self.workDone,
+                orient=tk.HORIZONTAL,
+                length=300)
+            self.bar.grid(row=1, column=0, columnspan=2, sticky='W')
+
+            self.queueLabel = ttk.Label(self.progress, text="")
+            self.queueLabel.grid(row=2, column=0, sticky='W')
+
+            self.cancelButton = ttk.Button(self.progress, style="T.TButton")
+            self.cancelButton.grid(row=2, column=1, sticky='E')
+
+            self.metricsLabel = ttk.Label(self.progress, text="", justify=tk.LEFT)
+            self.metricsLabel.grid(row=3, column=0, columnspan=2, sticky='W')
+
+            self.workDone.set(0)
+        #The window may still be up showing the last run's metrics
+        self.cancelButton["text"] = "Cancel"
+        self.cancelButton["command"] = self.cancelRun
+        self.queueLabel.config(text=str(len(self.runQueue.pending)) + " queued")
+        return
 
-        self.updateLabel.config(text="Cleaning Up...")
-        self.workDone.set(90)
+    #Progress callback for the run queue
+    def showRunProgress(self, job, fraction, label):
+        self.updateLabel.config(text=job["name"] + ": " + label)
+        self.workDone.set(int(100*fraction))
+        return
 
-        self.updateLabel.config(text="Displaying...")
-        self.workDone.set(95)
+    #Completion callback for the run queue; shows the requested output of
+    #finished runs and closes the progress window once the queue is empty
+    def finishRun(self, job, status, payload):
+        showMetrics = False
+        if status == "done":
+            writeRecord(grabTruePath(DEFAULT_METRICS_FILE), payload["metrics"])
+            showMetrics = job["showMetrics"]
+            if job["display"] in payload:
+                self.loadFileFromPath(payload[job["display"]])
+        elif status == "error":
+            print("Run " + job["name"] + " failed:\n" + payload)
+
+        if self.progress is not None:
+            if showMetrics:
+                self.metricsLabel.config(text=job["name"] + "\n" +
+                    formatRecord(payload["metrics"]) + "\n" +
+                    "Conservation drift %.1e" % payload["drift"]["max"])
+            if self.runQueue.isBusy():
+                self.workDone.set(0)
+                self.updateLabel.config(text="Starting...")
+                self.queueLabel.config(text=str(len(self.runQueue.pending)) + " queued")
+            elif showMetrics:
+                #Keep the window up so the metrics can be read
+                self.updateLabel.config(text=job["name"] + ": Done")
+                self.queueLabel.config(text="")
+                self.cancelButton["text"] = "Close"
+                self.cancelButton["command"] = self.closeProgress
+            else:
+                self.closeProgress()
+        return
 
-        if self.displayMode.get() == 0:
-            self.loadFileFromPath(compOutPath)
-        if self.displayMode.get() == 1:
-            self.loadFileFromPath(paramOutPath)
-        if self.displayMode.get() == 2:
-            self.loadFileFromPath(animOutPath)
+    def closeProgress(self):
+        if self.progress is not None:
+            self.progress.destroy()
+            self.progress = None
+        return
 
-        self.updateLabel.config(text="Done")
-        self.workDone.set(100)
+    #Stops the run in progress; the next queued one (if any) starts right away
+    def cancelRun(self):
+        self.runQueue.cancel()
+        return
 
-        self.progress.destroy()
-        #self.rConfig.grab_set()
+    def cancelAllRuns(self):
+        self.runQueue.cancelAll()
+        self.closeProgress()
+        return
 
+    #Cancels every run, then closes the application
+    def quitApp(self):
+        self.runQueue.cancelAll()
+        self.master.destroy()
         return
 
 
     def changeFrame(self, scaleValue):
         newFrame = int(scaleValue)
         self.currentFrame = newFrame
-        self.setLabelFrame(self.currentFrame, self.allAnimFrames, self.animFrameNumber)
+        self.setLabelFrame(self.currentFrame)
         return
 
     def update(self):
         #print("Updating")
+        self.runQueue.poll()
+        if self.isAnimLoaded and self.frameProvider is not None:
+            indexed = self.frameProvider.frameCount
+            if indexed > self.animFrameNumber:
+                self.animFrameNumber = indexed
+                self.gifScale.config(to=self.animFrameNumber - 1)
         if self.isAnimLoaded and self.isPlaying:
-            if self.currentFrame == self.animFrameNumber:
+            if self.currentFrame >= self.animFrameNumber:
                 self.currentFrame = 0
             self.master.after(
                 int(np.ceil(self.FRAME_DELAY - 10)),
                 self.setLabelFrame,
-                self.currentFrame,
-                self.allAnimFrames,
-                self.animFrameNumber
+                self.currentFrame
                 )
             self.gifScale.set(self.currentFrame)
             #print("Playing " + str(self.currentFrame))
@@ -918,7 +910,9 @@ def createWindow(geo, title, back):
 
     return window
 
-root = createWindow("800x800", 'GR Orbit Simulator v0.9', 'black')
-app = Application(master=root)
-app.master.after(0, app.update)
-app.mainloop()
+#Only when run directly, since run processes import this module afresh
+if __name__ == "__main__":
+    root = createWindow("800x800", 'GR Orbit Simulator v0.9', 'black')
+    app = Application(master=root)
+    app.master.after(0, app.update)
+    app.mainloop()